@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_vary_headers
+
+from rest_framework.renderers import JSONRenderer
+
+from core.cache import shared_ttl
+
+from .constants import (RECIPES_RESPONSE_GENERATION_KEY, RENDERED_CACHE_PREFIX,
+                        RENDERED_CACHE_TTL)
+from .fragments import bump
+
+Rendered = namedtuple('Rendered',
+                      ('body', 'gzipped', 'etag', 'built_at', 'version'))
+
+
+def accepts_gzip(request):
+    qualities = {}
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for coding in header.split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+class RenderedCache:
+
+    def __init__(self, ttl=RENDERED_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def version_key(key):
+        return f'{RENDERED_CACHE_PREFIX}:version:{key}'
+
+    def invalidate(self, key):
+        bump(self.version_key(key))
+
+    def expired(self, entry):
+        return time.monotonic() - entry.built_at > shared_ttl(self.ttl)
+
+    def get(self, key, get_data):
+        version = cache.get(self.version_key(key))
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version or self.expired(entry):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._entries[key] = self.render(get_data(), version)
+                entry = self._entries[key]
+        return entry
+
+    @staticmethod
+    def render(data, version=None):
+        body = JSONRenderer().render(data)
+        return Rendered(
+            body=body,
+            gzipped=gzip.compress(body, mtime=0),
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            built_at=time.monotonic(),
+            version=version,
+        )
+
+    def response(self, request, key, get_data):
+        return self.entry_response(request, self.get(key, get_data))
+
+    @staticmethod
+    def entry_response(request, entry):
+        use_gzip = accepts_gzip(request)
+        etag = f'{entry.etag[:-1]}-gzip"' if use_gzip else entry.etag
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if etag in etags or '*' in etags:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+        response = HttpResponse(entry.gzipped if use_gzip else entry.body,
+                                content_type='application/json')
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class ResponseCache(RenderedCache):
+
+    def __init__(self, generation_key, ttl, max_size):
+        super().__init__(ttl)
+        self.generation_key = generation_key
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def response(self, request, key, get_response):
+        key = (cache.get(self.generation_key), *key)
+        entry = self.lookup(key)
+        if entry is None:
+            response = get_response()
+            if response.status_code != HTTPStatus.OK:
+                return response
+            entry = self.store(key, self.render(response.data))
+        return self.entry_response(request, entry)
+
+
+rendered_cache = RenderedCache()
+recipes_response_cache = ResponseCache(
+    RECIPES_RESPONSE_GENERATION_KEY, settings.RECIPES_RESPONSE_CACHE_TTL,
+    settings.RECIPES_RESPONSE_CACHE_SIZE)
@@ -1,8 +1,52 @@
 # Shopping Cart Constants
+FONT_NAME = 'DejaVuSans'
+FONT_FILE = 'DejaVuSans.ttf'
 FONT_SIZE = 12
 SHOPPING_CART_X_SIZE = 100
 SHOPPING_CART_OFFSET_X = 50
 SHOPPING_CART_OFFSET_Y = 70
+SHOPPING_CART_LINE_HEIGHT = 20
+SHOPPING_CART_BOTTOM_MARGIN = 50
+RENDER_VERSION = 1
+RENDER_JOB_PENDING = 'pending'
+RENDER_JOB_READY = 'ready'
+RENDER_JOB_FAILED = 'failed'
+RENDER_JOB_ID_REGEX = r'[0-9a-f]{64}'
+
+# Image Upload Constants
+BASE64_CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_SIDE = 8000
+MAX_IMAGE_PIXELS = 40_000_000
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 0, 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'PNG'),
+    (b'GIF87a', 0, 'GIF'),
+    (b'GIF89a', 0, 'GIF'),
+    (b'WEBP', 8, 'WEBP'),
+)
+
+# Image Derivatives Constants
+DERIVATIVE_VERSION = 1
+DERIVATIVES_DIR = 'derivatives'
+DERIVATIVE_QUALITY = 82
+DERIVATIVE_EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+# Seconds before a derivative known to exist is checked on disk again
+DERIVATIVE_READY_TTL = 300
+# Seconds before a failed derivative is retried, doubled per failure
+DERIVATIVE_RETRY_DELAY = 60
+DERIVATIVE_MAX_RETRY_DELAY = 3600
+# variant: (width, height, format, crop to exact size)
+IMAGE_DERIVATIVES = {
+    'image': {
+        'thumbnail': (480, 320, 'JPEG', True),
+        'thumbnail_webp': (480, 320, 'WEBP', True),
+        'webp': (1280, 1280, 'WEBP', False),
+    },
+    'avatar': {
+        'thumbnail': (96, 96, 'JPEG', True),
+        'thumbnail_webp': (96, 96, 'WEBP', True),
+    },
+}
 
 # User Constants
 MAX_USER_EMAIL_LENGTH = 254
@@ -10,5 +54,42 @@ MAX_USER_USERNAME_LENGTH = 150
 MAX_USER_FIRSTNAME_LENGTH = 150
 MAX_USER_LASTNAME_LENGTH = 150
 
+# Reference Data Cache Constants
+RENDERED_CACHE_PREFIX = 'rendered'
+RENDERED_CACHE_TTL = 300
+TAGS_CACHE_KEY = 'tags'
+INGREDIENTS_CACHE_KEY = 'ingredients'
+
+# Recipe Fragment Cache Constants
+FRAGMENT_CACHE_PREFIX = 'fragments'
+FRAGMENT_CACHE_TTL = 3600
+FRAGMENTS_GENERATION_KEY = f'{FRAGMENT_CACHE_PREFIX}:generation'
+AUTHOR_FRAGMENT_FIELDS = ('email', 'id', 'username', 'first_name',
+                          'last_name')
+# User fields that appear in recipe responses
+AUTHOR_RESPONSE_FIELDS = (*AUTHOR_FRAGMENT_FIELDS, 'avatar')
+
+# Recipes Response Cache Constants
+RECIPES_RESPONSE_GENERATION_KEY = 'responses:recipes:generation'
+
+# Subscriptions Constants
+SUBSCRIPTION_RECIPES_LIMIT = 10
+MAX_SUBSCRIPTION_RECIPES_LIMIT = 50
+
+# Request Profiling Constants
+PROFILE_TRIGGER_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_ID_REGEX = r'[0-9A-Za-z-]{1,64}'
+PROFILE_MODE_CPROFILE = 'cprofile'
+PROFILE_MODE_SAMPLE = 'sample'
+PROFILE_MODES = (PROFILE_MODE_CPROFILE, PROFILE_MODE_SAMPLE)
+PSTATS_EXTENSION = 'pstats'
+COLLAPSED_EXTENSION = 'collapsed'
+
 # Any
 PAGINATION_PAGE_SIZE = 6
+CURSOR_PAGINATION_PARAM = 'pagination'
+CURSOR_PAGINATION_VALUE = 'cursor'
+TRUE_VALUES = ('1', 'true', 'True')
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from PIL import Image, ImageOps
+
+from .constants import (DERIVATIVE_EXTENSIONS, DERIVATIVE_MAX_RETRY_DELAY,
+                        DERIVATIVE_QUALITY, DERIVATIVE_READY_TTL,
+                        DERIVATIVE_RETRY_DELAY, DERIVATIVE_VERSION,
+                        DERIVATIVES_DIR, IMAGE_DERIVATIVES)
+
+logger = logging.getLogger(__name__)
+
+
+def render_derivative(source, target, width, height, image_format, crop):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if crop:
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if image_format == 'JPEG'
+                                  else 'RGBA')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp = f'{target}.{os.getpid()}.tmp'
+        image.save(temp, image_format, quality=DERIVATIVE_QUALITY)
+    os.replace(temp, target)
+    return target
+
+
+class Derivatives:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+        # name: monotonic time until which the file is trusted to exist
+        self._ready = {}
+        # name: (failed attempts, monotonic time of the next attempt)
+        self._failures = {}
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = futures.ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS)
+        return self._executor
+
+    @staticmethod
+    def name(file, variant):
+        *_, image_format, _ = IMAGE_DERIVATIVES[file.field.name][variant]
+        path = PurePosixPath(file.name)
+        return str(PurePosixPath(
+            DERIVATIVES_DIR, f'v{DERIVATIVE_VERSION}', variant, path.parent,
+            f'{path.stem}.{DERIVATIVE_EXTENSIONS[image_format]}'))
+
+    def is_ready(self, name):
+        # Another process may have deleted the file, so it is re-checked
+        # on disk once the TTL runs out.
+        if self._ready.get(name, 0) > time.monotonic():
+            return True
+        if default_storage.exists(name):
+            self.mark_ready(name)
+            return True
+        self._ready.pop(name, None)
+        return False
+
+    def mark_ready(self, name):
+        self._ready[name] = time.monotonic() + DERIVATIVE_READY_TTL
+
+    def submit(self, file, variant):
+        name = self.name(file, variant)
+        if self.is_ready(name):
+            return None
+        with self._lock:
+            failure = self._failures.get(name)
+            if name in self._pending or (
+                    failure and failure[1] > time.monotonic()):
+                return None
+            args = (file.path, default_storage.path(name),
+                    *IMAGE_DERIVATIVES[file.field.name][variant])
+            try:
+                future = self.executor.submit(render_derivative, *args)
+            except futures.process.BrokenProcessPool:
+                self._executor = None
+                future = self.executor.submit(render_derivative, *args)
+            self._pending.add(name)
+        future.add_done_callback(lambda done: self.finish(name, done))
+        return future
+
+    def submit_all(self, file):
+        if not file:
+            return []
+        return [future for future in (
+            self.submit(file, variant)
+            for variant in IMAGE_DERIVATIVES[file.field.name]
+        ) if future is not None]
+
+    def finish(self, name, future):
+        with self._lock:
+            self._pending.discard(name)
+            if future.exception() is None:
+                self._failures.pop(name, None)
+                self.mark_ready(name)
+                return
+            attempts = self._failures.get(name, (0, 0))[0] + 1
+            delay = min(DERIVATIVE_RETRY_DELAY * 2 ** (attempts - 1),
+                        DERIVATIVE_MAX_RETRY_DELAY)
+            self._failures[name] = (attempts, time.monotonic() + delay)
+        logger.warning('Не удалось создать %s (попытка %s, следующая через '
+                       '%s с): %s', name, attempts, delay, future.exception())
+
+    def url(self, file, variant):
+        if not file:
+            return None
+        name = self.name(file, variant)
+        if self.is_ready(name):
+            return default_storage.url(name)
+        self.submit(file, variant)
+        return file.url
+
+    def delete(self, file):
+        for variant in IMAGE_DERIVATIVES.get(file.field.name, ()):
+            name = self.name(file, variant)
+            self._ready.pop(name, None)
+            self._failures.pop(name, None)
+            default_storage.remove(name)
+
+
+derivatives = Derivatives()
@@ -1,14 +1,39 @@
-import base64
+from django.core.exceptions import ValidationError as DjangoValidationError
 
-from django.core.files.base import ContentFile
+from rest_framework.serializers import (ImageField, PrimaryKeyRelatedField,
+                                        ReadOnlyField)
 
-from rest_framework.serializers import ImageField
+from api.derivatives import derivatives
+from api.images import decode_data_url, validate_image_file
 
 
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_data_url(data)
+        if hasattr(data, 'read') and hasattr(data, 'size'):
+            validate_image_file(data)
         return super().to_internal_value(data)
+
+
+class ImageDerivativeField(ReadOnlyField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        url = derivatives.url(value, self.variant)
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class PrefetchedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        objects = self.context.get('related_objects', {}).get(model, {})
+        try:
+            return objects[model._meta.pk.to_python(data)]
+        except (KeyError, TypeError, DjangoValidationError):
+            return super().to_internal_value(data)
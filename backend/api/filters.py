@@ -1,6 +1,6 @@
 from django_filters.rest_framework import CharFilter, FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, Tag
 
 
 class IngredientsNameFilter(FilterSet):
@@ -8,12 +8,21 @@ class IngredientsNameFilter(FilterSet):
 
     class Meta:
         model = Ingredient
-        fields = ('name')
+        fields = ('name',)
+
+
+class TagsFilter(filters.ModelMultipleChoiceFilter):
+
+    def filter(self, queryset, value):
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag__in=value).values('recipe_id'))
 
 
 class RecipeFilter(FilterSet):
 
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagsFilter(queryset=Tag.objects.all(), to_field_name='slug')
     is_favorited = filters.BooleanFilter(
         method='is_favorited_filter',
         label='В избранном'
@@ -30,11 +39,11 @@ class RecipeFilter(FilterSet):
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopcart__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
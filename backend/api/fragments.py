@@ -0,0 +1,107 @@
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from rest_framework.relations import PKOnlyObject
+
+from core.cache import shared_ttl
+
+from .constants import (FRAGMENT_CACHE_PREFIX, FRAGMENT_CACHE_TTL,
+                        FRAGMENTS_GENERATION_KEY)
+
+
+def version_key(kind, pk):
+    return f'{FRAGMENT_CACHE_PREFIX}:version:{kind}:{pk}'
+
+
+def set_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def bump(key):
+    # Bump at once so that the request changing the row does not read its
+    # own stale fragment, and again after commit for concurrent readers.
+    set_version(key)
+    transaction.on_commit(lambda: set_version(key))
+
+
+def represent(field, instance):
+    attribute = field.get_attribute(instance)
+    value = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+    return None if value is None else field.to_representation(attribute)
+
+
+class FragmentMixin:
+    fragment_fields = ()
+
+    def get_fragment(self, instance):
+        fragment = {}
+        for field in self._readable_fields:
+            if field.field_name in self.fragment_fields:
+                fragment[field.field_name] = represent(field, instance)
+            elif isinstance(field, FragmentMixin):
+                fragment[field.field_name] = field.get_fragment(
+                    field.get_attribute(instance))
+        return fragment
+
+    def merge_fragment(self, instance, fragment):
+        data = OrderedDict()
+        for field in self._readable_fields:
+            name = field.field_name
+            if name in self.fragment_fields:
+                data[name] = fragment[name]
+            elif isinstance(field, FragmentMixin):
+                data[name] = field.merge_fragment(
+                    field.get_attribute(instance), fragment[name])
+            else:
+                data[name] = represent(field, instance)
+        return data
+
+
+class RecipeFragments:
+
+    @staticmethod
+    def fragment_key(pk):
+        return f'{FRAGMENT_CACHE_PREFIX}:recipe:{pk}'
+
+    @staticmethod
+    def version_keys(recipe):
+        return (version_key('recipe', recipe.pk),
+                version_key('user', recipe.author_id),
+                FRAGMENTS_GENERATION_KEY)
+
+    def get_many(self, recipes, build):
+        version_keys = {recipe.pk: self.version_keys(recipe)
+                        for recipe in recipes}
+        cached = cache.get_many([
+            *map(self.fragment_key, version_keys),
+            *{key for keys in version_keys.values() for key in keys},
+        ])
+        new_versions = {key: uuid.uuid4().hex
+                        for keys in version_keys.values() for key in keys
+                        if key not in cached}
+        if new_versions:
+            cache.set_many(new_versions, None)
+            cached.update(new_versions)
+        versions = {pk: tuple(cached[key] for key in keys)
+                    for pk, keys in version_keys.items()}
+        fragments, missing = {}, []
+        for recipe in recipes:
+            entry = cached.get(self.fragment_key(recipe.pk))
+            if entry is not None and entry[0] == versions[recipe.pk]:
+                fragments[recipe.pk] = entry[1]
+            else:
+                missing.append(recipe)
+        if missing:
+            built = build(missing)
+            cache.set_many({
+                self.fragment_key(pk): (versions[pk], fragment)
+                for pk, fragment in built.items()
+            }, shared_ttl(FRAGMENT_CACHE_TTL))
+            fragments.update(built)
+        return fragments
+
+
+recipe_fragments = RecipeFragments()
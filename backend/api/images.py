@@ -0,0 +1,100 @@
+import base64
+import binascii
+import threading
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from PIL import Image, UnidentifiedImageError
+from rest_framework.serializers import ValidationError
+
+from .constants import (BASE64_CHUNK_SIZE, IMAGE_SIGNATURES, MAX_IMAGE_PIXELS,
+                        MAX_IMAGE_SIDE)
+
+IMAGE_HEADER_SIZE = max(offset + len(signature)
+                        for signature, offset, _ in IMAGE_SIGNATURES)
+
+_decoded = threading.local()
+
+
+def decoded_files():
+    if not hasattr(_decoded, 'files'):
+        _decoded.files = []
+    return _decoded.files
+
+
+def close_decoded_files():
+    # The storage moves a new blob away or skips a duplicate one, in
+    # both cases the temporary file is only removed on close().
+    files = decoded_files()
+    while files:
+        files.pop().close()
+
+
+def check_size(size):
+    if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+        raise ValidationError(
+            'Размер изображения превышает '
+            f'{settings.MAX_IMAGE_UPLOAD_SIZE // (1024 * 1024)} МБ.')
+
+
+def sniff_format(header):
+    for signature, offset, image_format in IMAGE_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return image_format
+    return None
+
+
+def validate_image_file(file):
+    check_size(file.size)
+    file.seek(0)
+    image_format = sniff_format(file.read(IMAGE_HEADER_SIZE))
+    if image_format is None:
+        raise ValidationError('Неподдерживаемый формат изображения.')
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            opened_format = image.format
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является изображением.')
+    if opened_format != image_format:
+        raise ValidationError('Содержимое не совпадает с форматом файла.')
+    if (max(width, height) > MAX_IMAGE_SIDE
+            or width * height > MAX_IMAGE_PIXELS):
+        raise ValidationError(
+            f'Изображение больше {MAX_IMAGE_SIDE} точек по стороне.')
+    file.seek(0)
+    return file
+
+
+def decode_data_url(data):
+    marker = data.find(';base64,')
+    if marker == -1:
+        raise ValidationError('Ожидается изображение в формате base64.')
+    content_type = data[len('data:'):marker]
+    extension = content_type.split('/')[-1]
+    start = marker + len(';base64,')
+    # The raw length bounds the decoded size before anything is copied.
+    check_size((len(data) - start) // 4 * 3)
+    file = TemporaryUploadedFile(f'temp.{extension}', content_type,
+                                 (len(data) - start) // 4 * 3, None)
+    # Whitespace is dropped per chunk; the tail that does not fill a
+    # 4-character group is carried over to the next chunk.
+    tail = ''
+    try:
+        for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+            chunk = tail + ''.join(
+                data[offset:offset + BASE64_CHUNK_SIZE].split())
+            whole = len(chunk) - len(chunk) % 4
+            file.write(base64.b64decode(chunk[:whole], validate=False))
+            tail = chunk[whole:]
+        if tail:
+            raise ValueError(tail)
+    except (binascii.Error, ValueError):
+        file.close()
+        raise ValidationError('Некорректные данные base64.')
+    decoded_files().append(file)
+    file.size = file.tell()
+    file.seek(0)
+    return file
@@ -0,0 +1,246 @@
+import base64
+import io
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Count
+from django.test.utils import (override_settings, setup_databases,
+                               teardown_databases)
+
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+# name: (method, url template, query budget)
+ENDPOINTS = {
+    'recipes-list-anonymous': ('get', '/api/recipes/', 0),
+    'recipes-list': ('get', '/api/recipes/', 3),
+    'recipes-list-tags': ('get', '/api/recipes/?tags={tag}', 4),
+    'recipes-list-cursor': ('get', '/api/recipes/?pagination=cursor', 2),
+    'recipe-retrieve': ('get', '/api/recipes/{recipe}/', 2),
+    'recipe-create': ('post', '/api/recipes/', 15),
+    'recipe-update': ('patch', '/api/recipes/{own_recipe}/', 20),
+    'favorite-add': ('post', '/api/recipes/{recipe}/favorite/', 6),
+    'shopping-cart-add': ('post', '/api/recipes/{recipe}/shopping_cart/', 9),
+    'download-shopping-cart': (
+        'get', '/api/recipes/download_shopping_cart/?format=txt', 1),
+    'ingredients-search': ('get', '/api/ingredients/?name={ingredient}', 0),
+    'subscriptions': ('get', '/api/users/subscriptions/?recipes_limit=3', 3),
+    'users-list': ('get', '/api/users/', 3),
+}
+ANONYMOUS = ('recipes-list-anonymous',)
+TRACED_RUNS = 3
+TRANSACTION_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT',
+                          'ROLLBACK')
+BENCHMARK_SEED = 0
+BENCHMARK_USERS = 200
+BENCHMARK_RECIPES = 2000
+BENCHMARK_HOST = 'testserver'
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет число запросов, время и память эндпоинтов API '
+            'и сравнивает их с бюджетом и базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'endpoints', nargs='*',
+            help=f'По умолчанию все: {", ".join(ENDPOINTS)}')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=BENCHMARK_SEED)
+        parser.add_argument(
+            '--baseline',
+            default=settings.BASE_DIR / 'api_benchmark_baseline.json',
+            help='JSON с базовой линией')
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Сохранить результаты как новую базовую линию')
+        parser.add_argument(
+            '--threshold', type=float, default=0.5,
+            help='Допустимое относительное ухудшение времени и памяти')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу, чтобы не генерировать данные '
+                 'при следующем запуске')
+
+    def handle(self, *args, **options):
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}.')
+        # Synthetic data, cache entries and uploads must not reach the
+        # real database, cache or media.
+        old_config = setup_databases(
+            options['verbosity'], interactive=False,
+            keepdb=options['keepdb'], aliases={DEFAULT_DB_ALIAS})
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(ALLOWED_HOSTS=[BENCHMARK_HOST],
+                                      CACHES=BENCHMARK_CACHES,
+                                      MEDIA_ROOT=media_root):
+                self.run_benchmark(options)
+        finally:
+            teardown_databases(old_config, options['verbosity'],
+                               keepdb=options['keepdb'])
+
+    def run_benchmark(self, options):
+        for catalog, model in (('ingredients', Ingredient), ('tags', Tag)):
+            if not model.objects.exists():
+                call_command('load_catalog', catalog, stdout=self.stdout)
+        prefix = f'synthetic{options["seed"]}_'
+        if not User.objects.filter(username__startswith=prefix).exists():
+            call_command('generate_data', seed=options['seed'],
+                         users=BENCHMARK_USERS, recipes=BENCHMARK_RECIPES,
+                         stdout=self.stdout)
+        user = User.objects.filter(username__startswith=prefix).annotate(
+            subscriptions=Count('subscriber')
+        ).order_by('-subscriptions', 'pk').first()
+        params = self.get_params(user)
+        clients = {True: APIClient(SERVER_NAME=BENCHMARK_HOST),
+                   False: APIClient(SERVER_NAME=BENCHMARK_HOST)}
+        clients[False].force_authenticate(user)
+
+        baseline_path = Path(options['baseline'])
+        baseline = (json.loads(baseline_path.read_text())
+                    if baseline_path.exists() else {})
+        results, failures = {}, []
+        for name in options['endpoints'] or ENDPOINTS:
+            method, url, budget = ENDPOINTS[name]
+            client = clients[name in ANONYMOUS]
+            request = self.make_request(client, method, url.format(**params),
+                                        self.get_data(name, params))
+            result = results[name] = self.measure(request, options['repeat'])
+            self.stdout.write(
+                f'{name}: {result["queries"]} queries (budget {budget}), '
+                f'p50 {result["p50"]:.1f} ms, p95 {result["p95"]:.1f} ms, '
+                f'peak {result["peak"] / 1024:.0f} KiB, '
+                f'{result["blocks"]} blocks retained')
+            failures.extend(self.find_regressions(
+                name, result, budget, baseline.get(name),
+                options['threshold']))
+        if options['save_baseline']:
+            baseline.update(results)
+            baseline_path.write_text(json.dumps(baseline, indent=2,
+                                                sort_keys=True))
+            self.stdout.write(f'Baseline saved to {baseline_path}.')
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def get_params(self, user):
+        return {
+            'tag': Tag.objects.order_by('pk').values_list(
+                'slug', flat=True).first(),
+            'recipe': Recipe.objects.exclude(author=user).exclude(
+                favorite__user=user).exclude(shopcart__user=user).order_by(
+                'pk').values_list('pk', flat=True).first(),
+            'own_recipe': Recipe.objects.filter(author=user).order_by(
+                'pk').values_list('pk', flat=True).first(),
+            'ingredient': Ingredient.objects.order_by('pk').values_list(
+                'name', flat=True).first()[:3],
+            'ingredients': list(Ingredient.objects.order_by('pk').values_list(
+                'pk', flat=True)[:5]),
+            'tags': list(Tag.objects.order_by('pk').values_list(
+                'pk', flat=True)[:2]),
+        }
+
+    @staticmethod
+    def get_data(name, params):
+        if name not in ('recipe-create', 'recipe-update'):
+            return None
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 120, 60)).save(buffer, 'PNG')
+        return {
+            'name': 'Бенчмарк',
+            'text': 'Рецепт для замеров.',
+            'cooking_time': 10,
+            'tags': params['tags'],
+            'ingredients': [{'id': pk, 'amount': amount}
+                            for amount, pk in enumerate(
+                                params['ingredients'], start=1)],
+            'image': 'data:image/png;base64,'
+                     + base64.b64encode(buffer.getvalue()).decode(),
+        }
+
+    @staticmethod
+    def make_request(client, method, url, data):
+        def request():
+            with transaction.atomic():
+                response = getattr(client, method)(url, data, format='json')
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{method.upper()} {url}: {response.status_code} '
+                        f'{getattr(response, "data", "")}')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                transaction.set_rollback(True)
+            return response
+        return request
+
+    @staticmethod
+    def measure(request, repeat):
+        request()
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            if not sql.startswith(TRANSACTION_STATEMENTS):
+                queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            request()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - started) * 1000)
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(TRACED_RUNS):
+                before = tracemalloc.take_snapshot()
+                tracemalloc.reset_peak()
+                request()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                retained.append(sum(
+                    stat.count_diff for stat in
+                    tracemalloc.take_snapshot().compare_to(before, 'filename')
+                    if stat.count_diff > 0))
+        finally:
+            tracemalloc.stop()
+        return {
+            'queries': len(queries),
+            'p50': statistics.median(timings),
+            'p95': (statistics.quantiles(timings, n=20)[18]
+                    if len(timings) > 1 else timings[0]),
+            'peak': min(peaks),
+            'blocks': min(retained),
+        }
+
+    @staticmethod
+    def find_regressions(name, result, budget, baseline, threshold):
+        if result['queries'] > budget:
+            yield (f'{name}: {result["queries"]} запросов '
+                   f'при бюджете {budget}.')
+        if baseline is None:
+            return
+        if result['queries'] > baseline['queries']:
+            yield (f'{name}: {result["queries"]} запросов, в базовой линии '
+                   f'{baseline["queries"]}.')
+        for metric in ('p50', 'peak'):
+            if result[metric] > baseline[metric] * (1 + threshold):
+                yield (f'{name}: {metric} {result[metric]:.1f} хуже базовой '
+                       f'линии {baseline[metric]:.1f} более чем на '
+                       f'{threshold:.0%}.')
@@ -0,0 +1,37 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.storage import file_fields, referenced_names, release
+
+
+class Command(BaseCommand):
+    help = 'Удаляет медиафайлы, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, ничего не удаляя')
+
+    def handle(self, *args, **options):
+        referenced = referenced_names()
+        removed = size = 0
+        for model, field in file_fields():
+            root = default_storage.path(field.upload_to)
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(
+                        path, default_storage.location).replace(os.sep, '/')
+                    if name in referenced or filename.startswith('.'):
+                        continue
+                    removed += 1
+                    size += os.path.getsize(path)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(name)
+                    if not options['dry_run']:
+                        release(field.attr_class(None, field, name))
+        self.stdout.write(
+            f'Unreferenced: {removed} files, {size / 1024 / 1024:.1f} MB'
+            f'{" (dry run)" if options["dry_run"] else " removed"}.')
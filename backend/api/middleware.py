@@ -0,0 +1,95 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .constants import PROFILE_ID_HEADER
+from .profiling import is_staff, profile_id, requested_mode, run_profiled
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.duration += duration
+            self.statements[sql] += 1
+            if not many:
+                try:
+                    self.executions[hash((sql, tuple(params or ())))] += 1
+                except TypeError:
+                    # Unhashable parameters are not matched as duplicates.
+                    pass
+            if duration >= settings.SQL_SLOW_QUERY_MS:
+                # Parameters carry tokens, password hashes and emails.
+                logger.warning('Медленный запрос %.1f ms: %s', duration, sql)
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.executions.values())
+
+    @property
+    def repeated(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+class QueryInstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = (time.perf_counter() - started) * 1000
+        timing = (f'db;dur={stats.duration:.1f};desc="{stats.count} queries, '
+                  f'{stats.duplicates} duplicates", app;dur={total:.1f}')
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.duration, 1),
+            'total_ms': round(total, 1),
+            'duplicates': stats.duplicates,
+            'repeated': stats.repeated,
+        }))
+        return response
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if not mode or not is_staff(request):
+            return self.get_response(request)
+        name = profile_id(request)
+        response = run_profiled(mode, name, self.get_response, request)
+        response[PROFILE_ID_HEADER] = name
+        return response
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from .constants import PAGINATION_PAGE_SIZE
 
@@ -6,3 +6,9 @@ from .constants import PAGINATION_PAGE_SIZE
 class DefaultPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = PAGINATION_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = PAGINATION_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import FileUploadParser, MultiPartParser
+
+
+class ContentLengthLimitMixin:
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        meta = parser_context['request'].META
+        try:
+            content_length = int(meta.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.MAX_IMAGE_UPLOAD_SIZE + (
+                settings.MAX_IMAGE_UPLOAD_OVERHEAD):
+            raise ParseError('Размер запроса превышает допустимый.')
+        return super().parse(stream, media_type, parser_context)
+
+
+class ImageMultiPartParser(ContentLengthLimitMixin, MultiPartParser):
+    pass
+
+
+class ImageUploadParser(ContentLengthLimitMixin, FileUploadParser):
+    media_type = 'image/*'
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        return filename or f'upload.{media_type.split("/")[-1]}'
@@ -0,0 +1,115 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.exceptions import AuthenticationFailed
+
+from .constants import (COLLAPSED_EXTENSION, PROFILE_ID_REGEX,
+                        PROFILE_MODE_SAMPLE, PROFILE_MODES,
+                        PROFILE_QUERY_PARAM, PROFILE_REQUEST_ID_HEADER,
+                        PROFILE_TRIGGER_HEADER, PSTATS_EXTENSION)
+
+
+class StackSampler:
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} '
+                             f'({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def runcall(self, function, *args):
+        self._thread.start()
+        try:
+            return function(*args)
+        finally:
+            self._stop.set()
+            self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+def requested_mode(request):
+    mode = (request.META.get(PROFILE_TRIGGER_HEADER)
+            or request.GET.get(PROFILE_QUERY_PARAM))
+    return mode if mode in PROFILE_MODES else None
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    # Only a request that carries a token is worth a database lookup.
+    authorization = get_authorization_header(request).split()
+    keyword = TokenAuthentication.keyword.lower().encode()
+    if not authorization or authorization[0].lower() != keyword:
+        return False
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def profile_id(request):
+    request_id = request.META.get(PROFILE_REQUEST_ID_HEADER, '')
+    if re.fullmatch(PROFILE_ID_REGEX, request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+def directory():
+    path = Path(settings.REQUEST_PROFILE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def profile_path(name, extension):
+    return directory() / f'{name}.{extension}'
+
+
+def prune():
+    expired = time.time() - settings.REQUEST_PROFILE_TTL
+    for path in directory().iterdir():
+        if path.stat().st_mtime < expired:
+            path.unlink(missing_ok=True)
+
+
+def run_profiled(mode, name, function, *args):
+    if mode == PROFILE_MODE_SAMPLE:
+        profiler = StackSampler(threading.get_ident(),
+                                settings.REQUEST_PROFILE_SAMPLE_INTERVAL)
+        result = profiler.runcall(function, *args)
+        profiler.dump(profile_path(name, COLLAPSED_EXTENSION))
+    else:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args)
+        profiler.dump_stats(os.fspath(profile_path(name, PSTATS_EXTENSION)))
+    prune()
+    return result
@@ -0,0 +1,168 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+from pathlib import Path
+
+from django.conf import settings
+
+from .constants import (RENDER_JOB_FAILED, RENDER_JOB_PENDING,
+                        RENDER_JOB_READY, RENDER_VERSION)
+from .shopping_list import write_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class RenderJobs:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._futures = {}
+
+    @property
+    def directory(self):
+        directory = Path(settings.SHOPPING_LIST_CACHE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=settings.SHOPPING_LIST_RENDER_WORKERS,
+                thread_name_prefix='shopping-list',
+            )
+        return self._executor
+
+    @staticmethod
+    def artifact_id(ingredients):
+        # Identical carts share one rendered file.
+        content = json.dumps([RENDER_VERSION, ingredients],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    @staticmethod
+    def job_id(user_id, artifact_id):
+        # Keyed by the secret and the owner: a job id cannot be derived
+        # from a guessed shopping list or reused by another user.
+        return hmac.new(settings.SECRET_KEY.encode(),
+                        f'{user_id}:{artifact_id}'.encode(),
+                        hashlib.sha256).hexdigest()
+
+    def path(self, artifact_id):
+        return self.directory / f'{artifact_id}.pdf'
+
+    def job_record(self, job_id):
+        return self.directory / f'{job_id}.job'
+
+    def pending_marker(self, artifact_id):
+        return self.directory / f'{artifact_id}.pending'
+
+    def failed_marker(self, artifact_id):
+        return self.directory / f'{artifact_id}.failed'
+
+    def artifact(self, job_id, user_id):
+        try:
+            artifact_id = self.job_record(job_id).read_text()
+        except FileNotFoundError:
+            return None
+        if not hmac.compare_digest(job_id,
+                                   self.job_id(user_id, artifact_id)):
+            return None
+        return artifact_id
+
+    def submit(self, user_id, ingredients):
+        ingredients = list(ingredients)
+        artifact_id = self.artifact_id(ingredients)
+        job_id = self.job_id(user_id, artifact_id)
+        self.job_record(job_id).write_text(artifact_id)
+        path = self.path(artifact_id)
+        try:
+            os.utime(path)
+            return job_id, None
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            future = self._futures.get(artifact_id)
+            created = future is None
+            if created:
+                self.failed_marker(artifact_id).unlink(missing_ok=True)
+                self.pending_marker(artifact_id).touch()
+                future = self.executor.submit(write_pdf, ingredients,
+                                              str(path))
+                self._futures[artifact_id] = future
+        if created:
+            # A finished future runs the callback at once, and finish()
+            # takes the lock.
+            future.add_done_callback(
+                lambda done: self.finish(artifact_id, done))
+        return job_id, future
+
+    def finish(self, artifact_id, future):
+        if future.exception() is not None:
+            self.fail(artifact_id, future.exception())
+        with self._lock:
+            self._futures.pop(artifact_id, None)
+        self.pending_marker(artifact_id).unlink(missing_ok=True)
+        self.prune()
+
+    def fail(self, artifact_id, error):
+        marker = self.failed_marker(artifact_id)
+        if not marker.exists():
+            logger.error('Не удалось создать список покупок %s: %s',
+                         artifact_id, error)
+            marker.touch()
+
+    def prune(self):
+        expired = time.time() - settings.SHOPPING_LIST_CACHE_TTL
+        for path in (*self.directory.glob('*.pdf'),
+                     *self.directory.glob('*.failed'),
+                     *self.directory.glob('*.job')):
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+    def status(self, job_id, user_id):
+        artifact_id = self.artifact(job_id, user_id)
+        if artifact_id is None:
+            return None
+        if self.path(artifact_id).exists():
+            return RENDER_JOB_READY
+        if self.failed_marker(artifact_id).exists():
+            return RENDER_JOB_FAILED
+        if artifact_id in self._futures:
+            return RENDER_JOB_PENDING
+        marker = self.pending_marker(artifact_id)
+        if (marker.exists() and time.time() - marker.stat().st_mtime
+                < settings.SHOPPING_LIST_RENDER_TIMEOUT * 2):
+            return RENDER_JOB_PENDING
+        return None
+
+    def file(self, job_id, user_id):
+        artifact_id = self.artifact(job_id, user_id)
+        if artifact_id is None or not self.path(artifact_id).exists():
+            return None
+        return self.path(artifact_id)
+
+    def wait(self, job_id, user_id, future, timeout=None):
+        if future is not None:
+            try:
+                future.result(
+                    timeout or settings.SHOPPING_LIST_RENDER_TIMEOUT)
+            except futures.TimeoutError:
+                return None
+            except Exception as error:
+                # The done callback may not have run yet.
+                self.fail(self.artifact(job_id, user_id), error)
+                return None
+        return self.file(job_id, user_id)
+
+
+render_jobs = RenderJobs()
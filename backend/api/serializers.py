@@ -1,27 +1,66 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers, status
 from rest_framework.serializers import ModelSerializer
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.fields import Base64ImageField
+from api.constants import (AUTHOR_FRAGMENT_FIELDS,
+                           MAX_SUBSCRIPTION_RECIPES_LIMIT,
+                           SUBSCRIPTION_RECIPES_LIMIT)
+from api.fields import (Base64ImageField, ImageDerivativeField,
+                        PrefetchedPrimaryKeyRelatedField)
+from api.fragments import FragmentMixin, recipe_fragments
+from recipes import cart_totals
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import Subscriber, User
 
 
-class UserListSerializer(ModelSerializer):
+def get_subscribed_ids(request):
+    subscribed_ids = getattr(request, '_subscribed_ids', None)
+    if subscribed_ids is None:
+        subscribed_ids = set(
+            request.user.subscriber.values_list('subscribe_to_id', flat=True)
+        )
+        request._subscribed_ids = subscribed_ids
+    return subscribed_ids
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params.get(
+            'recipes_limit', SUBSCRIPTION_RECIPES_LIMIT))
+    except ValueError:
+        limit = SUBSCRIPTION_RECIPES_LIMIT
+    return min(max(limit, 0), MAX_SUBSCRIPTION_RECIPES_LIMIT)
+
+
+def get_ids(values):
+    return [int(value) for value in values
+            if isinstance(value, int) or str(value).isdecimal()]
+
+
+class UserListSerializer(FragmentMixin, ModelSerializer):
+    fragment_fields = AUTHOR_FRAGMENT_FIELDS
     is_subscribed = serializers.SerializerMethodField()
+    avatar_thumbnail = ImageDerivativeField('thumbnail', source='avatar')
+    avatar_thumbnail_webp = ImageDerivativeField('thumbnail_webp',
+                                                 source='avatar')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
-                  'last_name', 'is_subscribed', 'avatar')
+                  'last_name', 'is_subscribed', 'avatar',
+                  'avatar_thumbnail', 'avatar_thumbnail_webp')
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         request = self.context.get('request')
         if request and not request.user.is_anonymous:
-            return author.subscriber_to.filter(subscriber=request.user,
-                                               subscribe_to=author).exists()
+            return author.id in get_subscribed_ids(request)
         return False
 
 
@@ -33,6 +72,12 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
@@ -40,7 +85,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = PrefetchedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient',
         error_messages={
@@ -54,14 +99,22 @@ class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class IngredientSerializer(serializers.ModelSerializer):
-    amount = RecipeIngredientSerializer(read_only=True)
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if hasattr(data, 'all') else data
+        return self.child.to_representation_many(list(recipes))
+
+
+class RecipeReadSerializer(FragmentMixin, serializers.ModelSerializer):
+    fragment_fields = ('id', 'tags', 'ingredients', 'name', 'text',
+                       'cooking_time')
     author = UserListSerializer(required=False)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(
@@ -71,20 +124,43 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
+    image_thumbnail = ImageDerivativeField('thumbnail', source='image')
+    image_thumbnail_webp = ImageDerivativeField('thumbnail_webp',
+                                                source='image')
+    image_webp = ImageDerivativeField('webp', source='image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
+                  'is_in_shopping_cart', 'name', 'image', 'image_thumbnail',
+                  'image_thumbnail_webp', 'image_webp', 'text',
                   'cooking_time')
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        fragments = recipe_fragments.get_many(recipes, self.build_fragments)
+        return [self.merge_fragment(recipe, fragments[recipe.pk])
+                for recipe in recipes]
+
+    def build_fragments(self, recipes):
+        prefetch_related_objects(recipes, 'tags',
+                                 'recipeingredients__ingredient')
+        return {recipe.pk: self.get_fragment(recipe) for recipe in recipes}
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request and not request.user.is_anonymous:
             return obj.favorite.filter(user=request.user).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request and not request.user.is_anonymous:
             return obj.shopcart.filter(user=request.user).exists()
@@ -93,7 +169,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserListSerializer(required=False)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = PrefetchedPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all(), required=True)
     image = Base64ImageField(required=True, allow_null=True)
     ingredients = CreateIngredientInRecipeSerializer(
@@ -105,13 +181,56 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'name', 'image', 'text',
                   'cooking_time')
 
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            self.context['related_objects'] = {
+                Ingredient: Ingredient.objects.in_bulk(get_ids(
+                    item.get('id') for item in data.get('ingredients') or ()
+                    if isinstance(item, dict))),
+                Tag: Tag.objects.in_bulk(get_ids(data.get('tags') or ())),
+            }
+        return super().to_internal_value(data)
+
     def create_recipe_ingredients(self, recipe, ingredients):
-        RecipeIngredient.objects.bulk_create(RecipeIngredient(
-            recipe=recipe,
-            ingredient=ingredient.get('ingredient'),
-            amount=ingredient.get('amount'),)
+        recipe_ingredients = RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient.get('ingredient'),
+                amount=ingredient.get('amount'),)
             for ingredient in ingredients)
-
+        cart_totals.add_recipe_ingredients(recipe, recipe_ingredients)
+
+    def update_recipe_ingredients(self, recipe, ingredients):
+        existing = {item.ingredient_id: item
+                    for item in recipe.recipeingredients.all()}
+        new, changed, deltas = [], [], {}
+        for item in ingredients:
+            ingredient, amount = item['ingredient'], item['amount']
+            current = existing.pop(ingredient.id, None)
+            if current is None:
+                new.append(RecipeIngredient(recipe=recipe,
+                                            ingredient=ingredient,
+                                            amount=amount))
+                deltas[ingredient.id] = amount
+            elif current.amount != amount:
+                deltas[ingredient.id] = amount - current.amount
+                current.amount = amount
+                changed.append(current)
+        for ingredient_id, current in existing.items():
+            deltas[ingredient_id] = -current.amount
+        if existing:
+            # Cart totals get a single apply_deltas below.
+            with cart_totals.suspend(recipe.id):
+                RecipeIngredient.objects.filter(
+                    pk__in=[item.pk for item in existing.values()]
+                ).delete()
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(new)
+        if deltas:
+            cart_totals.apply_deltas(cart_totals.cart_user_ids(recipe.id),
+                                     deltas)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('recipe_ingredients', [])
         tags = validated_data.pop('tags', [])
@@ -120,17 +239,15 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.create_recipe_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        instance.tags.clear()
         ingredients = validated_data.pop('recipe_ingredients', [])
-        tags = validated_data.pop('tags', [])
-        instance.tags.set(tags)
-        self.create_recipe_ingredients(instance, ingredients)
+        instance.tags.set(validated_data.pop('tags', []))
+        self.update_recipe_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        return RecipeReadSerializer(instance).data
+        return RecipeReadSerializer(instance, context=self.context).data
 
     def validate(self, value):
         tags = value.get('tags')
@@ -171,21 +288,42 @@ class RecipeSerializer(serializers.ModelSerializer):
         return value
 
 
+class RecipeImageSerializer(serializers.ModelSerializer):
+    image = Base64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('image',)
+
+
 class DetailSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_thumbnail = ImageDerivativeField('thumbnail', source='image')
+    image_thumbnail_webp = ImageDerivativeField('thumbnail_webp',
+                                                source='image')
+    image_webp = ImageDerivativeField('webp', source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail',
+                  'image_thumbnail_webp', 'image_webp', 'cooking_time')
 
 
 class BaseFavoriteAndShopCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
-        fields = ('author', 'recipe')
+        fields = ('user', 'recipe')
+
+    def validate(self, data):
+        model = self.Meta.model
+        if model.objects.filter(user=data['user'],
+                                recipe=data['recipe']).exists():
+            raise serializers.ValidationError(
+                f'Рецепт уже добавлен в {model._meta.verbose_name}')
+        return data
 
     def to_representation(self, instance):
-        return DetailSerializer(instance).data
+        return DetailSerializer(instance.recipe, context=self.context).data
 
 
 class FavoriteSerializer(BaseFavoriteAndShopCartSerializer):
@@ -194,16 +332,21 @@ class FavoriteSerializer(BaseFavoriteAndShopCartSerializer):
 
 
 class ShopCartSerializer(BaseFavoriteAndShopCartSerializer):
-    class Meta:
+    class Meta(BaseFavoriteAndShopCartSerializer.Meta):
         model = ShoppingCart
 
 
 class RecipForSubscribersSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_thumbnail = ImageDerivativeField('thumbnail', source='image')
+    image_thumbnail_webp = ImageDerivativeField('thumbnail_webp',
+                                                source='image')
+    image_webp = ImageDerivativeField('webp', source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail',
+                  'image_thumbnail_webp', 'image_webp', 'cooking_time')
 
 
 class UserCreatesSerializer(UserCreateSerializer):
@@ -227,19 +370,14 @@ class AvatarSerializer(ModelSerializer):
 
 class SubscribeRecipesBase(UserListSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
 
     class Meta(UserListSerializer.Meta):
         fields = UserListSerializer.Meta.fields + ('recipes', 'recipes_count')
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_recipes(self, author):
-        from api.serializers import RecipForSubscribersSerializer
-        recipes = author.recipes.all()
-        request = self.context['request']
-        limit = int(request.GET.get('recipes_limit', 10))
-        if limit:
-            recipes = recipes[: int(limit)]
+        limit = get_recipes_limit(self.context['request'])
+        recipes = author.recipe.all()[:limit]
         serializer = RecipForSubscribersSerializer(recipes,
                                                    many=True,
                                                    read_only=True)
@@ -0,0 +1,127 @@
+import csv
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+from django.http import FileResponse, StreamingHttpResponse
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .constants import (FONT_FILE, FONT_NAME, FONT_SIZE,
+                        SHOPPING_CART_BOTTOM_MARGIN, SHOPPING_CART_LINE_HEIGHT,
+                        SHOPPING_CART_OFFSET_X, SHOPPING_CART_OFFSET_Y,
+                        SHOPPING_CART_X_SIZE)
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE))
+
+
+def format_line(ingredient):
+    return (f'{ingredient["ingredient__name"]} '
+            f'({ingredient["ingredient__measurement_unit"]}) '
+            f'— {ingredient["total_amount"]}')
+
+
+def render_pdf(ingredients):
+    register_fonts()
+    pdf_canvas = canvas.Canvas(None, pagesize=letter, pageCompression=1)
+    width, height = letter
+    pdf_canvas.setFont(FONT_NAME, FONT_SIZE)
+    pdf_canvas.drawString(SHOPPING_CART_X_SIZE,
+                          height - SHOPPING_CART_OFFSET_X,
+                          'Список покупок:')
+    y_position = height - SHOPPING_CART_OFFSET_Y
+    for ingredient in ingredients:
+        if y_position < SHOPPING_CART_BOTTOM_MARGIN:
+            pdf_canvas.showPage()
+            pdf_canvas.setFont(FONT_NAME, FONT_SIZE)
+            y_position = height - SHOPPING_CART_OFFSET_X
+        pdf_canvas.drawString(SHOPPING_CART_X_SIZE, y_position,
+                              format_line(ingredient))
+        y_position -= SHOPPING_CART_LINE_HEIGHT
+    pdf_canvas.showPage()
+    return pdf_canvas.getpdfdata()
+
+
+def write_pdf(ingredients, path):
+    content = render_pdf(ingredients)
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as temp_file:
+        temp_file.write(content)
+    os.replace(temp_path, path)
+    return path
+
+
+def streaming_response(content, content_type, extension):
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{extension}"'
+    )
+    return response
+
+
+def pdf_file_response(path):
+    return FileResponse(open(path, 'rb'), as_attachment=True,
+                        filename='shopping_cart.pdf',
+                        content_type='application/pdf')
+
+
+def iter_txt(ingredients):
+    yield 'Список покупок:\n'
+    for ingredient in ingredients:
+        yield format_line(ingredient) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((ingredient['ingredient__name'],
+                               ingredient['ingredient__measurement_unit'],
+                               ingredient['total_amount']))
+
+
+def iter_json(ingredients):
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['total_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def txt_response(ingredients):
+    return streaming_response(iter_txt(ingredients),
+                              'text/plain; charset=utf-8', 'txt')
+
+
+def csv_response(ingredients):
+    return streaming_response(iter_csv(ingredients),
+                              'text/csv; charset=utf-8', 'csv')
+
+
+def json_response(ingredients):
+    return streaming_response(iter_json(ingredients),
+                              'application/json', 'json')
+
+
+EXPORTS = {
+    'txt': txt_response,
+    'csv': csv_response,
+    'json': json_response,
+}
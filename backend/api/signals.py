@@ -0,0 +1,137 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+from .cache import rendered_cache
+from .constants import (AUTHOR_FRAGMENT_FIELDS, AUTHOR_RESPONSE_FIELDS,
+                        FRAGMENTS_GENERATION_KEY, INGREDIENTS_CACHE_KEY,
+                        RECIPES_RESPONSE_GENERATION_KEY, TAGS_CACHE_KEY)
+from .derivatives import derivatives
+from .fragments import bump, version_key
+from .images import close_decoded_files
+from .storage import release
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    rendered_cache.invalidate(TAGS_CACHE_KEY)
+    bump(FRAGMENTS_GENERATION_KEY)
+    bump(RECIPES_RESPONSE_GENERATION_KEY)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    rendered_cache.invalidate(INGREDIENTS_CACHE_KEY)
+    bump(FRAGMENTS_GENERATION_KEY)
+    bump(RECIPES_RESPONSE_GENERATION_KEY)
+
+
+def invalidate_recipe(pk):
+    bump(version_key('recipe', pk))
+    bump(RECIPES_RESPONSE_GENERATION_KEY)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_fragment(instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients_fragment(instance, **kwargs):
+    invalidate_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_fragment(instance, action, reverse, pk_set,
+                                    **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipe(instance.pk)
+    elif pk_set is None:
+        bump(FRAGMENTS_GENERATION_KEY)
+        bump(RECIPES_RESPONSE_GENERATION_KEY)
+    else:
+        for pk in pk_set:
+            invalidate_recipe(pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_fragment(instance, created, update_fields, **kwargs):
+    if created:
+        return
+    updated = set(AUTHOR_RESPONSE_FIELDS if update_fields is None
+                  else update_fields)
+    if updated & set(AUTHOR_FRAGMENT_FIELDS):
+        bump(version_key('user', instance.pk))
+    if updated & set(AUTHOR_RESPONSE_FIELDS):
+        bump(RECIPES_RESPONSE_GENERATION_KEY)
+
+
+def previous_name(sender, instance, field_name, update_fields):
+    """Имя файла до сохранения или None, если поле не менялось."""
+    if (field_name in instance.get_deferred_fields()
+            or update_fields is not None and field_name not in update_fields):
+        return None
+    file = getattr(instance, field_name)
+    # A file loaded from the database stays committed until it is replaced.
+    if not instance._state.adding and file and file._committed:
+        return None
+    if instance.pk is None:
+        return ''
+    return sender.objects.filter(pk=instance.pk).values_list(
+        field_name, flat=True).first() or ''
+
+
+def image_saved(instance, field_name):
+    previous = getattr(instance, f'_previous_{field_name}', None)
+    file = getattr(instance, field_name)
+    if previous is None or previous == (file.name or ''):
+        return
+    if previous:
+        field = instance._meta.get_field(field_name)
+        old = field.attr_class(instance, field, previous)
+        transaction.on_commit(lambda: release(old))
+    derivatives.submit_all(file)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, update_fields, **kwargs):
+    instance._previous_image = previous_name(sender, instance, 'image',
+                                             update_fields)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(instance, **kwargs):
+    image_saved(instance, 'image')
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(instance, **kwargs):
+    transaction.on_commit(lambda: release(instance.image))
+
+
+@receiver(pre_save, sender=User)
+def remember_avatar(sender, instance, update_fields, **kwargs):
+    instance._previous_avatar = previous_name(sender, instance, 'avatar',
+                                              update_fields)
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(instance, **kwargs):
+    image_saved(instance, 'avatar')
+
+
+@receiver(post_delete, sender=User)
+def release_avatar(instance, **kwargs):
+    transaction.on_commit(lambda: release(instance.avatar))
+
+
+@receiver(request_finished)
+def close_decoded_images(**kwargs):
+    close_decoded_files()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import uuid
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import FileField
+
+from .derivatives import derivatives
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    @staticmethod
+    def content_hash(content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        path = PurePosixPath(name)
+        digest = self.content_hash(content)
+        name = str(PurePosixPath(
+            path.parent, digest[:2], f'{digest}{path.suffix.lower()}'))
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Имя файла {name} длиннее {max_length} символов.')
+        return name
+
+    def _save(self, name, content):
+        lock_blob(name)
+        if self.exists(name):
+            return name
+        directory, filename = os.path.split(name)
+        temp_name = super()._save(
+            os.path.join(directory, f'.{uuid.uuid4().hex}.{filename}'),
+            content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+    def delete(self, name):
+        # Rows with identical content share one blob: FieldFile.delete()
+        # only releases it, the blob goes once nothing references it.
+        file = field_file(name)
+        if file is None:
+            self.remove(name)
+        else:
+            transaction.on_commit(lambda: release(file))
+
+    def remove(self, name):
+        super().delete(name)
+
+
+def lock_blob(name):
+    """Сериализует загрузку и удаление одного блоба до конца транзакции."""
+    if connection.vendor == 'postgresql':
+        key = int(hashlib.sha256(name.encode()).hexdigest()[:15], 16)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField):
+                yield model, field
+
+
+def field_file(name):
+    for model, field in file_fields():
+        if name.startswith(field.upload_to):
+            return field.attr_class(None, field, name)
+    return None
+
+
+def is_referenced(name):
+    return any(
+        model._default_manager.filter(**{field.name: name}).exists()
+        for model, field in file_fields()
+    )
+
+
+def referenced_names():
+    names = set()
+    for model, field in file_fields():
+        names.update(
+            model._default_manager.exclude(**{field.name: ''})
+            .exclude(**{f'{field.name}__isnull': True})
+            .values_list(field.name, flat=True).iterator()
+        )
+    return names
+
+
+def release(file):
+    if not file:
+        return
+    with transaction.atomic():
+        lock_blob(file.name)
+        if not is_referenced(file.name):
+            derivatives.delete(file)
+            file.storage.remove(file.name)
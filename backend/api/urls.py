@@ -1,10 +1,12 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 
 from rest_framework.routers import DefaultRouter
 
-from api.views import (AvatarPutDeleteView, IngredientsViewSet, RecipViewSet,
-                       SubcribeView, SubscribeListView, TagsViewSet,
-                       UserMeViewSet)
+from api.constants import (COLLAPSED_EXTENSION, PROFILE_ID_REGEX,
+                           PSTATS_EXTENSION)
+from api.views import (AvatarPutDeleteView, IngredientsViewSet, ProfileView,
+                       RecipViewSet, SubcribeView, SubscribeListView,
+                       TagsViewSet, UserMeViewSet)
 
 app_name = 'api'
 
@@ -21,4 +23,7 @@ urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('users/me/avatar/', AvatarPutDeleteView.as_view()),
     path('users/<int:pk>/subscribe/', SubcribeView.as_view()),
+    re_path(rf'^profiles/(?P<profile_id>{PROFILE_ID_REGEX})\.'
+            rf'(?P<extension>{PSTATS_EXTENSION}|{COLLAPSED_EXTENSION})$',
+            ProfileView.as_view()),
 ]
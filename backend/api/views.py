@@ -1,47 +1,86 @@
-import io
+from collections.abc import Mapping
+from functools import partial
+from urllib import parse
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect
 
+from django_filters import MultipleChoiceFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import (AllowAny, IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.constants import (FONT_SIZE, SHOPPING_CART_OFFSET_X,
-                           SHOPPING_CART_OFFSET_Y, SHOPPING_CART_X_SIZE)
+from api.cache import recipes_response_cache, rendered_cache
+from api.constants import (CURSOR_PAGINATION_PARAM, CURSOR_PAGINATION_VALUE,
+                           INGREDIENTS_CACHE_KEY, RENDER_JOB_ID_REGEX,
+                           RENDER_JOB_PENDING, RENDER_JOB_READY,
+                           TAGS_CACHE_KEY, TRUE_VALUES)
 from api.filters import IngredientsNameFilter, RecipeFilter
-from api.pagination import DefaultPagination
+from api.pagination import DefaultPagination, RecipeCursorPagination
+from api.parsers import ImageMultiPartParser, ImageUploadParser
 from api.permissions import IsOwnerOrReadOnly
+from api.profiling import profile_path
+from api.render_jobs import render_jobs
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.serializers import (AvatarSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeReadSerializer,
-                             RecipeSerializer, ShopCartSerializer,
-                             SubscriberListSerializer, SubscribeSerializer,
-                             TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                             IngredientSerializer, RecipeImageSerializer,
+                             RecipeReadSerializer, RecipeSerializer,
+                             ShopCartSerializer, SubscriberListSerializer,
+                             SubscribeSerializer, TagSerializer,
+                             get_recipes_limit)
+from api.shopping_list import EXPORTS, pdf_file_response
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartTotal, Tag)
+from recipes.search import ingredient_index
 from users.models import Subscriber
 
 User = get_user_model()
 
 
+def keep_query_params(url, names):
+    scheme, netloc, path, query, fragment = parse.urlsplit(url)
+    query = parse.urlencode(sorted(
+        (name, value) for name, value
+        in parse.parse_qsl(query, keep_blank_values=True) if name in names
+    ))
+    return parse.urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def upload_data(request, field):
+    """Тело запроса для сериализатора загрузки: файл, отправленный
+    без multipart, парсер кладёт под ключ file. Всё, что не словарь,
+    отклонит сам сериализатор."""
+    data = request.data
+    if isinstance(data, Mapping) and field not in data and 'file' in data:
+        return {field: data['file']}
+    return data
+
+
 class TagsViewSet(ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return rendered_cache.response(
+            request, TAGS_CACHE_KEY,
+            lambda: self.get_serializer(Tag.objects.all(), many=True).data
+        )
+
 
 class IngredientsViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -51,17 +90,90 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientsNameFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return rendered_cache.response(
+                request, INGREDIENTS_CACHE_KEY,
+                lambda: self.get_serializer(
+                    Ingredient.objects.all(), many=True).data
+            )
+        ingredients = []
+        if request.query_params.get('fuzzy') not in TRUE_VALUES:
+            ingredients = ingredient_index.search(name)
+        if not ingredients:
+            ingredients = ingredient_index.fuzzy_search(name)
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
 
 class RecipViewSet(ModelViewSet):
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags', 'recipeingredients__ingredient'
-    )
+    queryset = Recipe.objects.select_related('author')
     serializer_class = RecipeSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return super().get_queryset().with_user_flags(self.request.user)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if (params.get(CURSOR_PAGINATION_PARAM) == CURSOR_PAGINATION_VALUE
+                    or RecipeCursorPagination.cursor_query_param in params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = DefaultPagination()
+        return self._paginator
+
+    def get_response_cache_params(self):
+        return {*self.filterset_class.base_filters, CURSOR_PAGINATION_PARAM,
+                DefaultPagination.page_query_param,
+                DefaultPagination.page_size_query_param,
+                RecipeCursorPagination.cursor_query_param}
+
+    def get_response_cache_key(self, request):
+        filters = self.filterset_class.base_filters
+        names = self.get_response_cache_params()
+        params = request.query_params
+        return (request.build_absolute_uri(request.path), tuple(sorted(
+            (name, tuple(sorted(set(params.getlist(name))))
+             if isinstance(filters.get(name), MultipleChoiceFilter)
+             else params[name])
+            for name in params if name in names)))
+
+    def cached_response(self, request, get_response):
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return get_response()
+        names = self.get_response_cache_params()
+
+        def get_shared_response():
+            # The response is served for every query with the same key,
+            # so its page links must not carry the other parameters.
+            response = get_response()
+            if isinstance(response.data, dict):
+                for link in ('next', 'previous'):
+                    if response.data.get(link):
+                        response.data[link] = keep_query_params(
+                            response.data[link], names)
+            return response
+
+        return recipes_response_cache.response(
+            request, self.get_response_cache_key(request),
+            get_shared_response)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs))
+
     def show_short_link(self, request, pk):
         return redirect(f'/recipes/{pk}/')
 
@@ -73,6 +185,7 @@ class RecipViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
     def post_request_processing(self, request, model, serializer_class, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'user': request.user.id, 'recipe': recipe.id}
@@ -86,6 +199,7 @@ class RecipViewSet(ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_request_processing(self, request, model, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         deleted, _ = model.objects.filter(user=request.user,
@@ -102,6 +216,24 @@ class RecipViewSet(ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=True,
+        methods=['PATCH'],
+        parser_classes=(JSONParser, ImageMultiPartParser, ImageUploadParser),
+    )
+    @transaction.atomic
+    def image(self, request, pk):
+        recipe = self.get_object()
+        serializer = RecipeImageSerializer(
+            recipe, data=upload_data(request, 'image'))
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            RecipeReadSerializer(self.get_object(),
+                                 context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK
+        )
+
     @action(
         detail=True,
         methods=['GET'],
@@ -125,8 +257,7 @@ class RecipViewSet(ModelViewSet):
 
     @favorite.mapping.delete
     def favorite_delete(self, request, pk):
-        return self.delete_request_processing(request, Favorite,
-                                              FavoriteSerializer, pk)
+        return self.delete_request_processing(request, Favorite, pk)
 
     @action(
         methods=['POST'],
@@ -140,50 +271,85 @@ class RecipViewSet(ModelViewSet):
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request, pk):
-        return self.delete_request_processing(request, ShoppingCart,
-                                              ShopCartSerializer, pk)
+        return self.delete_request_processing(request, ShoppingCart, pk)
 
     @action(
         methods=['GET'],
         detail=False,
         permission_classes=(IsAuthenticated, ),
+        renderer_classes=(PDFRenderer, PlainTextRenderer, CSVRenderer,
+                          JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shopcart__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
-        )
-        buffer = self.create_pdf_buffer(ingredients)
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.pdf"'
+        ingredients = self.get_cart_totals(request.user)
+        if request.accepted_renderer.format in EXPORTS:
+            export = EXPORTS[request.accepted_renderer.format]
+            return export(ingredients.iterator())
+        job_id, future = render_jobs.submit(request.user.pk, ingredients)
+        path = render_jobs.wait(job_id, request.user.pk, future)
+        if path is None:
+            return self.render_job_response(request, job_id,
+                                            status.HTTP_202_ACCEPTED)
+        return pdf_file_response(path)
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        url_path='download_shopping_cart/jobs',
+    )
+    def shopping_cart_jobs(self, request):
+        job_id, _ = render_jobs.submit(request.user.pk,
+                                       self.get_cart_totals(request.user))
+        return self.render_job_response(request, job_id,
+                                        status.HTTP_202_ACCEPTED)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        url_path=rf'download_shopping_cart/jobs/(?P<job_id>'
+                 rf'{RENDER_JOB_ID_REGEX})',
+    )
+    def shopping_cart_job(self, request, job_id):
+        return self.render_job_response(request, job_id)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        url_path=rf'download_shopping_cart/jobs/(?P<job_id>'
+                 rf'{RENDER_JOB_ID_REGEX})/file',
+        renderer_classes=(PDFRenderer, JSONRenderer),
+    )
+    def shopping_cart_job_file(self, request, job_id):
+        path = render_jobs.file(job_id, request.user.pk)
+        if path is None:
+            raise Http404
+        return pdf_file_response(path)
+
+    def get_cart_totals(self, user):
+        return (
+            ShoppingCartTotal.objects
+            .filter(user=user)
+            .values('ingredient__name', 'ingredient__measurement_unit',
+                    'total_amount')
+            .order_by('ingredient__name')
         )
-        return response
-
-    def create_pdf_buffer(self, ingredients):
-        buffer = io.BytesIO()
-        pdf_canvas = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
-        pdf_canvas.setFont('DejaVuSans', FONT_SIZE)
-        pdf_canvas.drawString(SHOPPING_CART_X_SIZE,
-                              height - SHOPPING_CART_OFFSET_X,
-                              'Список покупок:')
-        y_position = height - SHOPPING_CART_OFFSET_Y
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            total_amount = ingredient['total_amount']
-            key = f'{name} ({measurement_unit})'
-            pdf_canvas.drawString(SHOPPING_CART_X_SIZE, y_position,
-                                  f"{key} — {total_amount}")
-            y_position -= 20
-        pdf_canvas.showPage()
-        pdf_canvas.save()
-        buffer.seek(0)
-        return buffer
+
+    def render_job_response(self, request, job_id,
+                            response_status=status.HTTP_200_OK):
+        job_status = render_jobs.status(job_id, request.user.pk)
+        if job_status is None:
+            raise Http404
+        data = {'id': job_id, 'status': job_status}
+        if job_status != RENDER_JOB_PENDING:
+            response_status = status.HTTP_200_OK
+        if job_status == RENDER_JOB_READY:
+            data['file'] = reverse('api:recipes-shopping-cart-job-file',
+                                   kwargs={'job_id': job_id},
+                                   request=request)
+        return Response(data, status=response_status)
 
 
 class UserMeViewSet(UserViewSet):
@@ -195,14 +361,18 @@ class UserMeViewSet(UserViewSet):
 
 class AvatarPutDeleteView(APIView):
     permission_classes = (IsAuthenticated, )
+    parser_classes = (JSONParser, ImageMultiPartParser, ImageUploadParser)
 
+    @transaction.atomic
     def put(self, request):
         user = request.user
-        serializer = AvatarSerializer(user, data=request.data)
+        serializer = AvatarSerializer(user,
+                                      data=upload_data(request, 'avatar'))
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @transaction.atomic
     def delete(self, request):
         user = request.user
         if user.avatar:
@@ -251,12 +421,35 @@ class SubscribeListView(APIView):
 
     def get(self, request):
         paginator = self.pagination_class()
-        user = request.user
-        subscriptions = user.subscriber.all()
-        subscribed_users = subscriptions.values('subscribe_to')
-        paginated_subscriptions = paginator.paginate_queryset(subscribed_users,
-                                                              request)
-        serializer = SubscriberListSerializer(paginated_subscriptions,
+        recipes_limit = get_recipes_limit(request)
+        authors = (
+            User.objects.filter(subscriber_to__subscriber=request.user)
+            .annotate(
+                is_subscribed=Value(True, output_field=BooleanField()),
+            )
+            .order_by('username')
+        )
+        paginated_authors = paginator.paginate_queryset(authors, request)
+        # Ranking only the authors on the page keeps the work
+        # proportional to the page size, not to the number of follows.
+        prefetch_related_objects(paginated_authors, Prefetch(
+            'recipe',
+            queryset=Recipe.objects.latest_per_author(
+                recipes_limit,
+                authors=[author.pk for author in paginated_authors]),
+        ))
+        serializer = SubscriberListSerializer(paginated_authors,
                                               many=True,
                                               context={'request': request})
         return paginator.get_paginated_response(serializer.data)
+
+
+class ProfileView(APIView):
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, profile_id, extension):
+        path = profile_path(profile_id, extension)
+        if not path.exists():
+            raise Http404
+        return FileResponse(path.open('rb'), as_attachment=True,
+                            filename=path.name)
@@ -0,0 +1,99 @@
+import re
+
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .constants import ADMIN_EXACT_COUNT_LIMIT
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = cursor.fetchone()[0]
+        estimate = int(re.search(r'rows=(\d+)', plan)[1])
+        if estimate < ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    template = 'admin/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__exact'
+        field = model._meta.get_field(self.field_name)
+        self.title = field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.hidden_params = [
+            (name, value) for name, values in request.GET.lists()
+            for value in values if name not in (self.parameter_name, PAGE_VAR)
+        ]
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        except (ValueError, ValidationError) as error:
+            raise IncorrectLookupParameters(error)
+
+    def choices(self, changelist):
+        yield {
+            'selected': not self.value(),
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+            'display': 'Все',
+        }
+
+    def widget(self):
+        return self.form_field.widget.render(
+            self.parameter_name, self.value(),
+            attrs={'id': f'id_filter_{self.parameter_name}',
+                   'onchange': 'this.form.submit()'})
+
+
+def autocomplete_filter(field_name):
+    return type(f'{field_name.title()}AutocompleteFilter',
+                (AutocompleteFilter,), {'field_name': field_name})
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if (isinstance(list_filter, type)
+                    and issubclass(list_filter, AutocompleteFilter)):
+                field = self.model._meta.get_field(list_filter.field_name)
+                media += AutocompleteSelect(field, self.admin_site).media
+        return media
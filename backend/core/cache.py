@@ -0,0 +1,19 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .constants import LOCAL_CACHE_TTL
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Видят ли записи кэша все процессы сервера."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def shared_ttl(ttl, alias=DEFAULT_CACHE_ALIAS):
+    """Время жизни данных, которые сбрасываются через кэш.
+
+    Кэш в памяти процесса не сообщает о сбросе другим процессам,
+    поэтому с ним данные живут не дольше LOCAL_CACHE_TTL секунд.
+    """
+    return ttl if is_shared(alias) else min(ttl, LOCAL_CACHE_TTL)
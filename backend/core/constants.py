@@ -0,0 +1,7 @@
+# Admin Constants
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Cache Constants
+# Seconds that data invalidated through a per-process cache may stay stale
+# in other processes
+LOCAL_CACHE_TTL = 5
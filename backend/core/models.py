@@ -0,0 +1,16 @@
+class CounterFieldsMixin:
+    """Не перезаписывает счётчики при обычном save() загруженного объекта:
+    их меняют только атомарные UPDATE из recipes.counters."""
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert') and not args):
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+                and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
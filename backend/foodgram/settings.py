@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'djoser',
     'rest_framework.authtoken',
+    'core',
     'users',
     'recipes',
     'api',
@@ -41,6 +42,33 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION') == 'True'
+SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', 100))
+if SQL_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'api.middleware.QueryInstrumentationMiddleware')
+
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING') == 'True'
+REQUEST_PROFILE_DIR = os.getenv('REQUEST_PROFILE_DIR',
+                                BASE_DIR / 'profiles')
+REQUEST_PROFILE_TTL = int(os.getenv('REQUEST_PROFILE_TTL', 7 * 86400))
+REQUEST_PROFILE_SAMPLE_INTERVAL = 0.001
+if REQUEST_PROFILING:
+    MIDDLEWARE.append('api.middleware.ProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -128,6 +156,36 @@ USE_TZ = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+DEFAULT_FILE_STORAGE = 'api.storage.ContentAddressedStorage'
+
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024))
+MAX_IMAGE_UPLOAD_OVERHEAD = 64 * 1024
+# Base64 images in JSON bodies are a third larger than the file itself.
+DATA_UPLOAD_MAX_MEMORY_SIZE = (
+    MAX_IMAGE_UPLOAD_SIZE * 4 // 3 + MAX_IMAGE_UPLOAD_OVERHEAD)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPES_RESPONSE_CACHE_TTL = int(os.getenv('RECIPES_RESPONSE_CACHE_TTL', 60))
+RECIPES_RESPONSE_CACHE_SIZE = int(
+    os.getenv('RECIPES_RESPONSE_CACHE_SIZE', 1000))
+
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv('IMAGE_DERIVATIVE_WORKERS', 2))
+
+SHOPPING_LIST_CACHE_DIR = os.getenv('SHOPPING_LIST_CACHE_DIR',
+                                    BASE_DIR / 'shopping_lists')
+SHOPPING_LIST_CACHE_TTL = int(os.getenv('SHOPPING_LIST_CACHE_TTL', 86400))
+SHOPPING_LIST_RENDER_WORKERS = int(
+    os.getenv('SHOPPING_LIST_RENDER_WORKERS', 2))
+SHOPPING_LIST_RENDER_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_RENDER_TIMEOUT', 30))
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'collected_static'
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from core.admin_utils import LargeTableAdminMixin, autocomplete_filter
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 
@@ -12,60 +13,53 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name', 'measurement_unit')
-    list_filter = ('name', 'measurement_unit')
+    search_fields = ('name',)
+    list_filter = ('measurement_unit',)
 
 
 class RecipesIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
-class RecipesAdmin(admin.ModelAdmin):
+class RecipesAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     inlines = [RecipesIngredientInline]
-    list_display = ('name', 'author', 'sum_favorites')
+    list_display = ('name', 'author', 'sum_favorites', 'in_carts_count')
     search_fields = ('name',)
-    list_filter = ('tags', 'author')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.select_related('author')
-        queryset = queryset.prefetch_related('tags', 'ingredients', 'favorite')
-        return queryset
+    list_filter = ('tags', autocomplete_filter('author'))
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
 
     def sum_favorites(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
     sum_favorites.short_description = 'Кол-во в избранном'
+    sum_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(RecipeIngredient)
-class RecipesIngredientAdmin(admin.ModelAdmin):
+class RecipesIngredientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
-    list_filter = ('recipe', 'ingredient')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.select_related('recipe', 'ingredient')
+    list_filter = (autocomplete_filter('recipe'),
+                   autocomplete_filter('ingredient'))
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.select_related('user', 'recipe')
+    list_filter = (autocomplete_filter('user'), autocomplete_filter('recipe'))
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.select_related('user', 'recipe')
+    list_filter = (autocomplete_filter('user'), autocomplete_filter('recipe'))
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartTotal
+
+_suspended = threading.local()
+
+
+def suspended_recipes():
+    if not hasattr(_suspended, 'recipe_ids'):
+        _suspended.recipe_ids = set()
+    return _suspended.recipe_ids
+
+
+@contextmanager
+def suspend(recipe_id):
+    """Удаление ингредиентов рецепта внутри блока не меняет итоги
+    построчно: вызывающий применяет дельты сам."""
+    recipe_ids = suspended_recipes()
+    recipe_ids.add(recipe_id)
+    try:
+        yield
+    finally:
+        recipe_ids.discard(recipe_id)
+
+
+def recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(recipe_id=recipe_id)
+                .values_list('ingredient_id', 'amount'))
+
+
+def cart_user_ids(recipe_id):
+    return list(ShoppingCart.objects.filter(recipe_id=recipe_id)
+                .values_list('user_id', flat=True))
+
+
+def negate(amounts):
+    return {ingredient: -amount for ingredient, amount in amounts.items()}
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {ingredient: delta for ingredient, delta in deltas.items()
+              if delta}
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic():
+        ShoppingCartTotal.objects.bulk_create(
+            (ShoppingCartTotal(user_id=user_id, ingredient_id=ingredient)
+             for user_id in user_ids
+             for ingredient, delta in deltas.items() if delta > 0),
+            ignore_conflicts=True
+        )
+        totals = ShoppingCartTotal.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas)
+        totals.update(total_amount=F('total_amount') + Case(
+            *(When(ingredient_id=ingredient, then=Value(delta))
+              for ingredient, delta in deltas.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        if min(deltas.values()) < 0:
+            totals.filter(total_amount__lte=0).delete()
+
+
+def add_recipe_ingredients(recipe, recipe_ingredients):
+    amounts = {item.ingredient_id: item.amount for item in recipe_ingredients}
+    if amounts:
+        apply_deltas(cart_user_ids(recipe.id), amounts)
+
+
+def expected_totals(user_ids=None):
+    queryset = RecipeIngredient.objects.filter(recipe__shopcart__isnull=False)
+    if user_ids:
+        queryset = queryset.filter(recipe__shopcart__user__in=user_ids)
+    return {
+        (row['recipe__shopcart__user'], row['ingredient']): row['total']
+        for row in queryset.values('recipe__shopcart__user', 'ingredient')
+        .annotate(total=Sum('amount')).order_by()
+    }
+
+
+def stored_totals(user_ids=None):
+    queryset = ShoppingCartTotal.objects.all()
+    if user_ids:
+        queryset = queryset.filter(user__in=user_ids)
+    return {
+        (user_id, ingredient_id): (pk, total)
+        for pk, user_id, ingredient_id, total in queryset.values_list(
+            'pk', 'user_id', 'ingredient_id', 'total_amount')
+    }
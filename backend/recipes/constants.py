@@ -5,6 +5,11 @@ MAX_TAG_SLUG_LENGTH = 32
 # Ingredients Constants
 MAX_INGREDIENT_NAME_LENGTH = 128
 MAX_INGREDIENT_MEASURE_UNIT_LENGTH = 64
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_INDEX_TTL = 300
+FUZZY_CHARS_PER_TYPO = 3
+FUZZY_MAX_TYPOS = 2
+NGRAM_SIZE = 3
 
 # Recipe Constants
 MAX_RECIPE_NAME_LENGTH = 256
@@ -0,0 +1,84 @@
+import threading
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Subscriber, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+# counter field: (counted model, foreign key to the counter owner)
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscriber, 'subscribe_to'),
+    },
+}
+
+
+_deleting = threading.local()
+
+
+def deleting():
+    if not hasattr(_deleting, 'objects'):
+        _deleting.objects = set()
+    return _deleting.objects
+
+
+def references_deleted(instance):
+    objects = deleting()
+    return any(
+        (field.related_model, getattr(instance, field.attname)) in objects
+        for field in instance._meta.concrete_fields if field.many_to_one
+    )
+
+
+def begin_delete(instance):
+    """Списывает разом все счётчики, которые уменьшит каскадное
+    удаление instance, чтобы обработчики строк их пропустили."""
+    deleting().add((type(instance), instance.pk))
+    for model, fields in COUNTERS.items():
+        for field, (related, foreign_key) in fields.items():
+            for relation in related._meta.concrete_fields:
+                if (relation.many_to_one and relation.name != foreign_key
+                        and relation.related_model is type(instance)):
+                    model.objects.filter(
+                        pk__in=related.objects.filter(
+                            **{relation.name: instance.pk}
+                        ).values(foreign_key),
+                        **{f'{field}__gte': 1},
+                    ).update(**{field: F(field) - 1})
+
+
+def end_delete(instance):
+    deleting().discard((type(instance), instance.pk))
+
+
+def adjust(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def counted(model, field):
+    related, foreign_key = COUNTERS[model][field]
+    return Coalesce(Subquery(
+        related.objects.filter(**{foreign_key: OuterRef('pk')})
+        .order_by().values(foreign_key).annotate(total=Count('pk'))
+        .values('total')
+    ), Value(0))
+
+
+def recount(model, field, verify=False):
+    stale = model.objects.annotate(expected=counted(model, field)).exclude(
+        **{field: F('expected')})
+    count = stale.count()
+    if count and not verify:
+        model.objects.filter(pk__in=stale.values('pk')).update(
+            **{field: counted(model, field)})
+    return count
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cart_totals import expected_totals, stored_totals
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и пересобирает итоги корзин покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить расхождения, ничего не меняя')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Ограничить проверку пользователем (можно повторять)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            expected = expected_totals(options['users'])
+            stored = stored_totals(options['users'])
+            missing = [
+                ShoppingCartTotal(user_id=user_id, ingredient_id=ingredient_id,
+                                  total_amount=total)
+                for (user_id, ingredient_id), total in expected.items()
+                if (user_id, ingredient_id) not in stored
+            ]
+            changed = [
+                ShoppingCartTotal(pk=pk, total_amount=expected[key])
+                for key, (pk, total) in stored.items()
+                if key in expected and expected[key] != total
+            ]
+            extra = [pk for key, (pk, total) in stored.items()
+                     if key not in expected]
+            if not options['verify']:
+                ShoppingCartTotal.objects.filter(pk__in=extra).delete()
+                ShoppingCartTotal.objects.bulk_update(
+                    changed, ('total_amount',), batch_size=1000)
+                ShoppingCartTotal.objects.bulk_create(missing,
+                                                      batch_size=1000)
+        self.stdout.write(
+            f'Totals: {len(expected)} expected, {len(missing)} missing, '
+            f'{len(changed)} changed, {len(extra)} extra '
+            f'({time.perf_counter() - started:.2f} s).')
+        if options['verify'] and (missing or changed or extra):
+            raise CommandError('Итоги корзин расходятся с корзинами.')
@@ -0,0 +1,222 @@
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from PIL import Image
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscriber, User
+
+BATCH_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+INGREDIENTS_PER_RECIPE = (3, 12)
+TAGS_PER_RECIPE = (1, 3)
+PUB_DATE_SPAN = timedelta(days=365)
+WORDS = ('нарезать', 'смешать', 'посолить', 'обжарить', 'запечь',
+         'перемешать', 'довести', 'до', 'кипения', 'остудить', 'подать',
+         'с', 'зеленью', 'на', 'сковороде', 'в', 'духовке', 'минут')
+
+
+def zipf_weights(size, exponent=ZIPF_EXPONENT):
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+def sample_count(rng, mean, limit):
+    return min(limit, int(rng.expovariate(1 / mean))) if mean else 0
+
+
+def sample_distinct(rng, population, cum_weights, count, exclude=None):
+    chosen = set()
+    for value in rng.choices(population, cum_weights=cum_weights,
+                             k=count * 2):
+        if len(chosen) == count:
+            break
+        if value != exclude:
+            chosen.add(value)
+    return chosen
+
+
+def fill_pks(model, objects, after):
+    if objects and objects[0].pk is None:
+        pks = model.objects.filter(pk__gt=after).order_by('pk').values_list(
+            'pk', flat=True)[:len(objects)]
+        for instance, pk in zip(objects, pks):
+            instance.pk = pk
+    return objects[-1].pk if objects else after
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетических пользователей, рецепты и связи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--subscriptions', type=float, default=10,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число избранных рецептов на пользователя')
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в корзине пользователя')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--password', default='synthetic-password')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'synthetic{options["seed"]}_'
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с seed={options["seed"]} уже сгенерированы.')
+        self.ingredients = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', 'measurement_unit'))
+        self.tags = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        if not self.ingredients or not self.tags:
+            raise CommandError(
+                'Сначала загрузите справочники командой load_catalog.')
+        with transaction.atomic():
+            users = self.timed('users', self.create_users,
+                               options['users'], options['password'])
+            recipes = self.timed('recipes', self.create_recipes,
+                                 users, options['recipes'])
+            self.timed('subscriptions', self.create_subscriptions,
+                       users, options['subscriptions'])
+            self.timed('favorites', self.create_links, Favorite,
+                       users, recipes, options['favorites'])
+            self.timed('shopping carts', self.create_links, ShoppingCart,
+                       users, recipes, options['carts'])
+            self.timed('cart totals', call_command, 'cart_totals',
+                       stdout=self.stdout)
+            self.timed('counters', call_command, 'recount',
+                       stdout=self.stdout)
+
+    def timed(self, label, function, *args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stdout.write(
+            f'Generated {label} ({time.perf_counter() - started:.2f} s).')
+        return result
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        after = last_pk(User)
+        pks = []
+        for batch in self.batches(count):
+            users = [
+                User(email=f'{self.prefix}{number}@example.com',
+                     username=f'{self.prefix}{number}',
+                     first_name=f'Имя{number}', last_name=f'Фамилия{number}',
+                     password=password)
+                for number in batch
+            ]
+            self.bulk_create(User, users)
+            after = fill_pks(User, users, after)
+            pks.extend(user.pk for user in users)
+        return pks
+
+    def create_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (230, 190, 140)).save(buffer, 'JPEG')
+        return default_storage.save(
+            f'{Recipe._meta.get_field("image").upload_to}synthetic.jpg',
+            ContentFile(buffer.getvalue()))
+
+    def create_recipes(self, authors, count):
+        rng = self.rng
+        image = self.create_image()
+        author_weights = zipf_weights(len(authors))
+        ingredient_weights = zipf_weights(len(self.ingredients))
+        tag_weights = zipf_weights(len(self.tags))
+        after = last_pk(Recipe)
+        now = timezone.now()
+        pks = []
+        for batch in self.batches(count):
+            recipes = [
+                Recipe(author_id=author, name=f'Рецепт {self.prefix}{number}',
+                       image=image, cooking_time=rng.randint(5, 240),
+                       text=' '.join(rng.choices(WORDS, k=30)))
+                for number, author in zip(batch, rng.choices(
+                    authors, cum_weights=author_weights, k=len(batch)))
+            ]
+            pub_dates = [now - rng.random() * PUB_DATE_SPAN
+                         for _ in recipes]
+            self.bulk_create(Recipe, recipes)
+            after = fill_pks(Recipe, recipes, after)
+            # auto_now_add overwrites pub_date on insert.
+            for recipe, pub_date in zip(recipes, pub_dates):
+                recipe.pub_date = pub_date
+            Recipe.objects.bulk_update(recipes, ('pub_date',),
+                                       batch_size=self.batch_size)
+            recipe_ingredients, recipe_tags = [], []
+            for recipe in recipes:
+                for index in sample_distinct(
+                        rng, range(len(self.ingredients)), ingredient_weights,
+                        rng.randint(*INGREDIENTS_PER_RECIPE)):
+                    ingredient, unit = self.ingredients[index]
+                    recipe_ingredients.append(RecipeIngredient(
+                        recipe_id=recipe.pk, ingredient_id=ingredient,
+                        amount=(rng.randint(1, 50) * 10
+                                if unit in ('г', 'мл')
+                                else rng.randint(1, 10))))
+                recipe_tags.extend(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                    for tag in sample_distinct(
+                        rng, self.tags, tag_weights,
+                        rng.randint(*TAGS_PER_RECIPE)))
+            self.bulk_create(RecipeIngredient, recipe_ingredients)
+            self.bulk_create(Recipe.tags.through, recipe_tags)
+            pks.extend(recipe.pk for recipe in recipes)
+        return pks
+
+    def create_subscriptions(self, users, mean):
+        weights = zipf_weights(len(users))
+        for batch in self.batches(len(users)):
+            self.bulk_create(Subscriber, [
+                Subscriber(subscriber_id=users[index], subscribe_to_id=author)
+                for index in batch
+                for author in sample_distinct(
+                    self.rng, users, weights,
+                    sample_count(self.rng, mean, len(users) - 1),
+                    exclude=users[index])
+            ])
+
+    def create_links(self, model, users, recipes, mean):
+        popularity = recipes[:]
+        self.rng.shuffle(popularity)
+        weights = zipf_weights(len(popularity))
+        for batch in self.batches(len(users)):
+            self.bulk_create(model, [
+                model(user_id=users[index], recipe_id=recipe)
+                for index in batch
+                for recipe in sample_distinct(
+                    self.rng, popularity, weights,
+                    sample_count(self.rng, mean, len(recipes)))
+            ])
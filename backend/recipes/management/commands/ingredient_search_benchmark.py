@@ -0,0 +1,104 @@
+import csv
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.constants import FUZZY_CHARS_PER_TYPO, FUZZY_MAX_TYPOS
+from recipes.models import Ingredient
+from recipes.search import IngredientIndex, normalize
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+MIN_QUERY_LENGTH = 4
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость поиска ингредиентов по индексу в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            help='CSV с ингредиентами; по умолчанию индекс строится по БД')
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--budget', type=float, default=1.0,
+            help='Допустимый p99 одного запроса в миллисекундах')
+
+    def handle(self, *args, **options):
+        index = IngredientIndex()
+        started = time.perf_counter()
+        ingredients = None
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as csv_file:
+                ingredients = [
+                    Ingredient(name=row[0].strip(),
+                               measurement_unit=row[1].strip())
+                    for row in csv.reader(csv_file)
+                ]
+            for ingredient in ingredients:
+                ingredient.uses = 0
+        keys = index.rebuild(ingredients).keys
+        if not keys:
+            raise CommandError('Каталог ингредиентов пуст.')
+        self.stdout.write(
+            f'Index: {len(keys)} ingredients built in '
+            f'{(time.perf_counter() - started) * 1000:.1f} ms')
+
+        generator = random.Random(options['seed'])
+        prefixes = self.make_prefixes(generator, keys, options['queries'],
+                                      MIN_QUERY_LENGTH)
+        # Две опечатки допускаются только в достаточно длинных запросах.
+        long_prefixes = self.make_prefixes(
+            generator, keys, options['queries'],
+            FUZZY_CHARS_PER_TYPO * FUZZY_MAX_TYPOS)
+
+        failed = False
+        for label, search, prefixes, queries in (
+            ('prefix', index.search, prefixes, prefixes),
+            ('fuzzy', index.fuzzy_search, prefixes,
+             [self.make_typo(generator, prefix) for prefix in prefixes]),
+            ('fuzzy x2', index.fuzzy_search, long_prefixes,
+             [self.make_typo(generator, self.make_typo(generator, prefix))
+              for prefix in long_prefixes]),
+        ):
+            timings, hits = [], 0
+            for prefix, query in zip(prefixes, queries):
+                started = time.perf_counter()
+                results = search(query)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += any(normalize(ingredient.name).startswith(prefix)
+                            for ingredient in results)
+            p99 = statistics.quantiles(timings, n=100)[98]
+            self.stdout.write(
+                f'{label}: mean {statistics.mean(timings):.3f} ms, '
+                f'p50 {statistics.median(timings):.3f} ms, '
+                f'p99 {p99:.3f} ms, max {max(timings):.3f} ms, '
+                f'recall {hits / len(queries):.1%}')
+            failed |= p99 > options['budget']
+        if failed:
+            raise CommandError(
+                f'p99 превышает бюджет {options["budget"]} ms.')
+
+    @staticmethod
+    def make_prefixes(generator, keys, count, min_length):
+        prefixes = []
+        for _ in range(count):
+            key = generator.choice(keys)
+            prefixes.append(key[:generator.randint(
+                min_length, max(min_length, len(key)))])
+        return prefixes
+
+    @staticmethod
+    def make_typo(generator, word):
+        chars = list(word)
+        position = generator.randrange(len(chars))
+        operation = generator.randrange(3)
+        if operation == 0:
+            chars[position] = generator.choice(ALPHABET)
+        elif operation == 1:
+            del chars[position]
+        else:
+            chars.insert(position, generator.choice(ALPHABET))
+        return ''.join(chars)
@@ -0,0 +1,127 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient, Tag
+
+CATALOGS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit'), 'name'),
+    'tags': (Tag, ('name', 'slug'), 'slug'),
+}
+BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file, fields):
+    for row in csv.reader(file):
+        yield dict(zip(fields, row)) if len(row) == len(fields) else None
+
+
+def iter_json(file, fields):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив объектов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('JSON-файл обрывается посреди массива.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield row if isinstance(row, dict) else None
+
+
+READERS = {'.csv': iter_csv, '.json': iter_json}
+
+
+def clean(row, fields):
+    if row is None:
+        return None
+    values = {field: str(row.get(field) or '').strip() for field in fields}
+    return values if all(values.values()) else None
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов или тегов из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog', choices=CATALOGS)
+        parser.add_argument(
+            'path', nargs='?',
+            help='Файл .csv или .json (по умолчанию data/<catalog>.csv)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Посчитать изменения и откатить транзакцию')
+
+    def handle(self, *args, **options):
+        catalog = options['catalog']
+        model, fields, key = CATALOGS[catalog]
+        path = Path(options['path']
+                    or settings.BASE_DIR / 'data' / f'{catalog}.csv')
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}.')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        started = time.perf_counter()
+        counts = dict.fromkeys(('read', 'inserted', 'updated', 'skipped'), 0)
+        with transaction.atomic(), path.open(encoding='utf-8') as file:
+            before = model.objects.count()
+            candidates = 0
+            rows = reader(file, fields)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                counts['read'] += len(batch)
+                cleaned = {}
+                for row in batch:
+                    row = clean(row, fields)
+                    if row is None or row[key] in cleaned:
+                        counts['skipped'] += 1
+                    if row is not None:
+                        cleaned[row[key]] = row
+                existing = model.objects.in_bulk(list(cleaned),
+                                                 field_name=key)
+                new, changed = [], []
+                for value, row in cleaned.items():
+                    instance = existing.get(value)
+                    if instance is None:
+                        new.append(model(**row))
+                    elif any(getattr(instance, field) != row[field]
+                             for field in fields):
+                        for field in fields:
+                            setattr(instance, field, row[field])
+                        changed.append(instance)
+                    else:
+                        counts['skipped'] += 1
+                model.objects.bulk_create(new, ignore_conflicts=True)
+                model.objects.bulk_update(
+                    changed, [field for field in fields if field != key])
+                candidates += len(new)
+                counts['updated'] += len(changed)
+            counts['inserted'] = model.objects.count() - before
+            counts['skipped'] += candidates - counts['inserted']
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        self.stdout.write(
+            f'{catalog.capitalize()}: {counts["read"]} read, '
+            f'{counts["inserted"]} inserted, {counts["updated"]} updated, '
+            f'{counts["skipped"]} skipped'
+            f'{" (dry run)" if options["dry_run"] else ""} '
+            f'({time.perf_counter() - started:.2f} s).')
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и пересчитывает денормализованные счётчики'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить расхождения, ничего не меняя')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stale = 0
+        with transaction.atomic():
+            for model, fields in COUNTERS.items():
+                for field in fields:
+                    count = recount(model, field, options['verify'])
+                    stale += count
+                    self.stdout.write(
+                        f'{model.__name__}.{field}: {count} stale.')
+        self.stdout.write(
+            f'Counters checked ({time.perf_counter() - started:.2f} s).')
+        if options['verify'] and stale:
+            raise CommandError('Счётчики расходятся с данными.')
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 
+from core.models import CounterFieldsMixin
 from users.models import User
 
 from .constants import (MAX_INGREDIENT_MEASURE_UNIT_LENGTH,
@@ -40,7 +43,43 @@ class Ingredient(models.Model):
         return (f'{self.name} {self.measurement_unit}')
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+        )
+
+    def latest_per_author(self, limit, authors=None):
+        """Не больше limit последних рецептов каждого автора."""
+        if limit <= 0:
+            return self.none()
+        ranked = Recipe.objects.order_by().annotate(rank=Window(
+            RowNumber(), partition_by=models.F('author'),
+            order_by=(models.F('pub_date').desc(), models.F('pk').desc()),
+        ))
+        if authors is not None:
+            ranked = ranked.filter(author__in=authors)
+        # Django 3.2 cannot filter on a window function, so the ranked
+        # rows are wrapped in a derived table.
+        sql, params = ranked.values('pk', 'rank').query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE rank <= %s',
+            (*params, limit),
+        ))
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(Tag, related_name='recipe',
                                   verbose_name='Тег')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -54,7 +93,8 @@ class Recipe(models.Model):
     )
     name = models.CharField('Название',
                             max_length=MAX_RECIPE_NAME_LENGTH,)
-    image = models.ImageField('Картинка', upload_to='recipe/images/',)
+    image = models.ImageField('Картинка', upload_to='recipe/images/',
+                              db_index=True)
     text = models.TextField('Описание')
     cooking_time = models.PositiveSmallIntegerField(
         'Время готовки',
@@ -64,11 +104,24 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Кол-во в избранном', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        'Кол-во в корзинах', default=0, editable=False)
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -151,3 +204,28 @@ class ShoppingCart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Пользователь')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент')
+    total_amount = models.IntegerField('Общее количество', default=0)
+
+    class Meta:
+        verbose_name = 'Итог корзины'
+        verbose_name_plural = 'Итоги корзин'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_cart_total'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
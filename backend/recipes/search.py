@@ -0,0 +1,188 @@
+import bisect
+import heapq
+import math
+from collections import Counter, defaultdict, namedtuple
+
+from django.db.models import Count
+
+from .constants import (FUZZY_CHARS_PER_TYPO, FUZZY_MAX_TYPOS,
+                        INGREDIENT_INDEX_TTL, INGREDIENT_SEARCH_LIMIT,
+                        NGRAM_SIZE)
+from .models import Ingredient
+from .snapshots import SnapshotIndex
+
+KEY_UPPER_BOUND = '\U0010ffff'
+
+Snapshot = namedtuple(
+    'Snapshot', ('keys', 'ingredients', 'postings', 'frequencies')
+)
+
+
+def normalize(value):
+    return ' '.join(value.casefold().split())
+
+
+def ngrams(value, size=NGRAM_SIZE):
+    """Все n-граммы длиной от 1 до size с их позициями в строке."""
+    for position in range(len(value)):
+        for end in range(position + 1, min(position + size, len(value)) + 1):
+            yield value[position:end], position
+
+
+def rarest_pieces(query, count, frequencies):
+    """Выбирает count непересекающихся n-грамм запроса с наименьшей
+    суммарной частотой в каталоге. Возвращает пары (позиция, n-грамма)."""
+    length = len(query)
+    costs = [
+        [(end, query[start:end], frequencies.get(query[start:end], 0))
+         for end in range(start + 1, min(start + NGRAM_SIZE, length) + 1)]
+        for start in range(length)
+    ]
+    best = [(0, ())] * (length + 1)
+    for _ in range(count):
+        previous, best = best, [(math.inf, ())] * (length + 1)
+        for start in range(length - 1, -1, -1):
+            best[start] = best[start + 1]
+            for end, piece, cost in costs[start]:
+                cost += previous[end][0]
+                if cost < best[start][0]:
+                    best[start] = (cost,
+                                   ((start, piece),) + previous[end][1])
+    return best[0][1]
+
+
+def prefix_matcher(query):
+    """Возвращает функцию: расстояние Левенштейна от query до ближайшего
+    префикса переданной строки.
+
+    Битово-параллельный алгоритм Майерса: строка матрицы динамического
+    программирования хранится в битовых масках, маски запроса
+    вычисляются один раз. Если расстояние заведомо больше limit,
+    функция возвращает любое значение больше limit, не дочитывая строку.
+    """
+    length = len(query)
+    masks = {}
+    for i, char in enumerate(query):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+
+    def distance(text, limit=length):
+        positive, negative = full, 0
+        score = best = length
+        remaining = len(text)
+        for char in text:
+            remaining -= 1
+            x = masks.get(char, 0) | negative
+            diagonal = (((positive + (x & positive)) & full)
+                        ^ positive) | x
+            horizontal_negative = positive & diagonal
+            horizontal_positive = (negative
+                                   | ~(positive | diagonal)) & full
+            if horizontal_positive & high:
+                score += 1
+            elif horizontal_negative & high:
+                score -= 1
+                if score < best:
+                    best = score
+            if best > limit and score - remaining > limit:
+                return best
+            x = ((horizontal_positive << 1) | 1) & full
+            negative = x & diagonal
+            positive = ((horizontal_negative << 1)
+                        | ~(x | diagonal)) & full
+        return best
+
+    return distance
+
+
+class IngredientIndex(SnapshotIndex):
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        super().__init__(ttl)
+
+    def build(self, ingredients=None):
+        if ingredients is None:
+            ingredients = Ingredient.objects.annotate(
+                uses=Count('recipeingredients')
+            )
+        ingredients = sorted(
+            ingredients, key=lambda ingredient: normalize(ingredient.name)
+        )
+        keys = [normalize(ingredient.name) for ingredient in ingredients]
+        postings = defaultdict(list)
+        frequencies = Counter()
+        for index, key in enumerate(keys):
+            for gram, position in ngrams(key):
+                postings[gram, position].append(index)
+                frequencies[gram] += 1
+        return Snapshot(keys, ingredients, dict(postings), dict(frequencies))
+
+    def rebuild(self, ingredients=None):
+        snapshot = self.build(ingredients)
+        with self._lock:
+            self.install(snapshot)
+        return snapshot
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        snapshot = self.get_snapshot()
+        keys, ingredients = snapshot.keys, snapshot.ingredients
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + KEY_UPPER_BOUND, lo=start)
+        ranked = heapq.nsmallest(
+            limit, range(start, end),
+            key=lambda position: (-ingredients[position].uses,
+                                  keys[position])
+        )
+        if len(ranked) < limit:
+            contains = (
+                position for position, key in enumerate(keys)
+                if query in key and not start <= position < end
+            )
+            ranked += heapq.nsmallest(
+                limit - len(ranked), contains,
+                key=lambda position: (-ingredients[position].uses,
+                                      keys[position])
+            )
+        return [ingredients[position] for position in ranked]
+
+    def fuzzy_search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        snapshot = self.get_snapshot()
+        keys, ingredients = snapshot.keys, snapshot.ingredients
+        max_distance = min(max(1, len(query) // FUZZY_CHARS_PER_TYPO),
+                           FUZZY_MAX_TYPOS, len(query) - 1)
+        # max_distance typos break at most max_distance of max_distance + 1
+        # disjoint pieces of the query, so some piece occurs in the key
+        # shifted by no more than max_distance characters.
+        candidates = set()
+        for start, piece in rarest_pieces(query, max_distance + 1,
+                                          snapshot.frequencies):
+            for position in range(max(0, start - max_distance),
+                                  start + max_distance + 1):
+                candidates.update(snapshot.postings.get((piece, position),
+                                                        ()))
+        min_length = len(query) - max_distance
+        prefix_length = len(query) + max_distance
+        distance = prefix_matcher(query)
+        distances = {}
+        scored = []
+        for position in candidates:
+            key = keys[position]
+            if len(key) < min_length:
+                continue
+            prefix = key[:prefix_length]
+            if prefix not in distances:
+                distances[prefix] = distance(prefix, max_distance)
+            if distances[prefix] <= max_distance:
+                scored.append((distances[prefix], len(key), key, position))
+        return [ingredients[item[-1]]
+                for item in heapq.nsmallest(limit, scored)]
+
+
+ingredient_index = IngredientIndex()
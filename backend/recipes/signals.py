@@ -0,0 +1,86 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cart_totals, counters
+from .models import Ingredient, RecipeIngredient, ShoppingCart
+from .search import ingredient_index
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_cart_totals(instance, created, **kwargs):
+    if created:
+        cart_totals.apply_deltas(
+            [instance.user_id], cart_totals.recipe_amounts(instance.recipe_id)
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_cart_totals(instance, **kwargs):
+    cart_totals.apply_deltas(
+        [instance.user_id],
+        cart_totals.negate(cart_totals.recipe_amounts(instance.recipe_id))
+    )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (
+            RecipeIngredient.objects.filter(pk=instance.pk)
+            .values_list('ingredient_id', 'amount').first()
+        )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_cart_totals(instance, **kwargs):
+    deltas = {instance.ingredient_id: instance.amount}
+    if getattr(instance, '_previous', None):
+        ingredient_id, amount = instance._previous
+        deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+    cart_totals.apply_deltas(cart_totals.cart_user_ids(instance.recipe_id),
+                             deltas)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def subtract_cart_totals(instance, **kwargs):
+    if instance.recipe_id in cart_totals.suspended_recipes():
+        return
+    cart_totals.apply_deltas(cart_totals.cart_user_ids(instance.recipe_id),
+                             {instance.ingredient_id: -instance.amount})
+
+
+def counter_receivers(sender, model, field, foreign_key):
+    @receiver(post_save, sender=sender, weak=False)
+    def increment(instance, created, **kwargs):
+        if created:
+            counters.adjust(model, getattr(instance, f'{foreign_key}_id'),
+                            field, 1)
+
+    @receiver(post_delete, sender=sender, weak=False)
+    def decrement(instance, **kwargs):
+        if not counters.references_deleted(instance):
+            counters.adjust(model, getattr(instance, f'{foreign_key}_id'),
+                            field, -1)
+
+
+for model, fields in counters.COUNTERS.items():
+    for field, (sender, foreign_key) in fields.items():
+        counter_receivers(sender, model, field, foreign_key)
+    receiver(pre_delete, sender=model, weak=False)(
+        lambda instance, **kwargs: counters.begin_delete(instance))
+    receiver(post_delete, sender=model, weak=False)(
+        lambda instance, **kwargs: counters.end_delete(instance))
+
+
+@receiver(request_finished)
+def forget_deleted_objects(**kwargs):
+    counters.deleting().clear()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.db import connection
+
+
+class SnapshotIndex:
+    """Снимок данных в памяти процесса.
+
+    Первый снимок строится синхронно, следующие — в фоновом потоке,
+    пока запросы обслуживает предыдущий. Снимок, собранный до вызова
+    invalidate(), не устанавливается: сборка начинается заново.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._building = False
+
+    def build(self):
+        raise NotImplementedError
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.install(self.build())
+                return self._snapshot
+        if time.monotonic() - self._built_at > self.ttl:
+            self.refresh()
+        return snapshot
+
+    def install(self, snapshot):
+        self._snapshot = snapshot
+        self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+        self.refresh()
+
+    def refresh(self):
+        with self._lock:
+            if self._building or self._snapshot is None:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            while True:
+                generation = self._generation
+                snapshot = self.build()
+                with self._lock:
+                    if generation == self._generation:
+                        self.install(snapshot)
+                        self._building = False
+                        return
+        finally:
+            self._building = False
+            connection.close()
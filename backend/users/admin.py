@@ -2,29 +2,43 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
 
+from core.admin_utils import LargeTableAdminMixin, autocomplete_filter
 from users.models import Subscriber, User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     list_display = ('email', 'username', 'first_name', 'last_name', 'avatar',
-                    'is_active')
-    search_fields = ('email', 'username', 'first_name', 'last name')
-    list_filter = ('is_active')
+                    'is_active', 'recipes_count', 'followers_count')
+    search_fields = ('email', 'username', 'first_name', 'last_name')
+    list_filter = ('is_active',)
     list_per_page = 25
-    fields = ('email', 'username', 'first_name', 'last_name', 'avatar',
-              'is_active')
-    readonly_fields = ('date_joined',)
+    fieldsets = (
+        (None, {'fields': ('email', 'username', 'password')}),
+        ('Личные данные', {'fields': ('first_name', 'last_name', 'avatar')}),
+        ('Права доступа', {'fields': ('is_active', 'is_staff',
+                                      'is_superuser')}),
+        ('Даты', {'fields': ('last_login', 'date_joined')}),
+    )
+    add_fieldsets = (
+        (None, {
+            'classes': ('wide',),
+            'fields': ('email', 'username', 'first_name', 'last_name',
+                       'password1', 'password2'),
+        }),
+    )
+    readonly_fields = ('last_login', 'date_joined')
 
 
 @admin.register(Subscriber)
-class SubscriberAdmin(admin.ModelAdmin):
-    list_display = ('subscriber', 'subscribe_to', 'created_at')
+class SubscriberAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('subscriber', 'subscribe_to')
     search_fields = ('subscriber__email', 'subscribe_to__email')
-    list_filter = ('subscribe_to',)
+    list_filter = (autocomplete_filter('subscriber'),
+                   autocomplete_filter('subscribe_to'))
     list_per_page = 20
-    fields = ('subscriber', 'subscribe_to', 'created_at')
-    readonly_fields = ('created_at',)
+    list_select_related = ('subscriber', 'subscribe_to')
+    autocomplete_fields = ('subscriber', 'subscribe_to')
 
 
 admin.site.unregister(Group)
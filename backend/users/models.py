@@ -3,11 +3,12 @@ from django.db import models
 
 from api.constants import (MAX_USER_EMAIL_LENGTH, MAX_USER_FIRSTNAME_LENGTH,
                            MAX_USER_LASTNAME_LENGTH, MAX_USER_USERNAME_LENGTH)
+from core.models import CounterFieldsMixin
 
 from .validators import username_regex_validator
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField('Электронная почта',
                               max_length=MAX_USER_EMAIL_LENGTH,
                               unique=True)
@@ -19,8 +20,14 @@ class User(AbstractUser):
     last_name = models.CharField('Фамилия',
                                  max_length=MAX_USER_LASTNAME_LENGTH)
     avatar = models.ImageField('Фото профиля', blank=True,
-                               null=True, upload_to='users/avatars/')
+                               null=True, upload_to='users/avatars/',
+                               db_index=True)
+    recipes_count = models.PositiveIntegerField(
+        'Кол-во рецептов', default=0, editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Кол-во подписчиков', default=0, editable=False)
 
+    counter_fields = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name', 'password')
 
@@ -1,3 +1,5 @@
+const SHOPPING_LIST_POLL_INTERVAL = 1000;
+
 class Api {
   constructor(url, headers) {
     this._url = url;
@@ -365,15 +367,35 @@ class Api {
     }).then(this.checkResponse);
   }
 
+  waitForShoppingList(job, headers) {
+    const url = `/api/recipes/download_shopping_cart/jobs/${job.id}/`;
+    if (job.status === "ready") {
+      return fetch(`${url}file/`, { method: "GET", headers });
+    }
+    if (job.status !== "pending") {
+      return Promise.reject(job);
+    }
+    return new Promise((resolve) =>
+      setTimeout(resolve, SHOPPING_LIST_POLL_INTERVAL)
+    )
+      .then(() => fetch(url, { method: "GET", headers }))
+      .then(this.checkResponse)
+      .then((next) => this.waitForShoppingList(next, headers));
+  }
+
   downloadFile() {
     const token = localStorage.getItem("token");
-    return fetch(`/api/recipes/download_shopping_cart/`, {
-      method: "GET",
-      headers: {
-        ...this._headers,
-        authorization: `Token ${token}`,
-      },
-    }).then(this.checkFileDownloadResponse);
+    const headers = {
+      ...this._headers,
+      authorization: `Token ${token}`,
+    };
+    return fetch(`/api/recipes/download_shopping_cart/jobs/`, {
+      method: "POST",
+      headers,
+    })
+      .then(this.checkResponse)
+      .then((job) => this.waitForShoppingList(job, headers))
+      .then(this.checkFileDownloadResponse);
   }
 }
 